@@ -0,0 +1,147 @@
+'''
+    Measures CSSParser throughput, in rules per second and MB/s, on a large
+    generated stylesheet, and compares it with the original parser, which
+    steps through the text one character at a time. The stylesheet mixes in
+    syntax the parser doesn't understand, so that error recovery is measured
+    too. Both parsers must produce the same rules.
+
+    Usage: python benchmarks/css_parser_benchmark.py [size in MB]
+'''
+
+import gc
+import os
+import random
+import sys
+import time
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from css.parser import CSSParser, CSSRule
+from css.selectors import CSSSelector, DescendantSelector, TagSelector
+
+class CharacterCSSParser(CSSParser):
+    '''
+        The original scanning methods, which look at one character at a time.
+    '''
+
+    def whitespace(self) -> None:
+        while self.i < len(self.s) and self.s[self.i].isspace():
+            self.i += 1
+
+    def word(self) -> str:
+        start = self.i
+        while self.i < len(self.s):
+            if self.s[self.i].isalnum() or self.s[self.i] in "#-.%":
+                self.i += 1
+            else:
+                break
+        if not (self.i > start):
+            raise Exception("Parsing error")
+        return self.s[start:self.i]
+
+    def pair(self) -> Tuple[str, str]:
+        prop = self.word()
+        self.whitespace()
+        self.literal(":")
+        self.whitespace()
+        val = self.word()
+        return prop.casefold(), val
+
+    def body(self) -> dict:
+        pairs = {}
+        while self.i < len(self.s) and self.s[self.i] != "}":
+            try:
+                prop, val = self.pair()
+                pairs[prop.casefold()] = val
+                self.whitespace()
+            except Exception:
+                why = self.ignore_until([";", "}"])
+                if why == ";":
+                    self.literal(";")
+                    self.whitespace()
+                else:
+                    break
+        return pairs
+
+    def selector(self) -> CSSSelector:
+        out = TagSelector(self.word().casefold())
+        self.whitespace()
+        while self.i < len(self.s) and self.s[self.i] != "{":
+            tag = self.word()
+            out = DescendantSelector(out, TagSelector(tag.casefold()))
+            self.whitespace()
+        return out
+
+    def ignore_until(self, chars: str) -> str | None:
+        while self.i < len(self.s):
+            if self.s[self.i] in chars:
+                return self.s[self.i]
+            else:
+                self.i += 1
+        return None
+
+TAGS = ["div", "p", "a", "li", "ul", "span", "h1", "h2", "table", "td", "nav", "section"]
+
+DECLARATIONS = [
+    "color: blue", "background-color: #f0f0f0", "font-size: 110%",
+    "font-weight: bold", "margin-left: 12px", "padding: 4px",
+    # Values and properties the parser can't read, which it has to skip.
+    "border: 1px solid rgb(0, 0, 0)", "font-family: \"Helvetica Neue\", sans-serif",
+    "width: calc(100% - 2em)", "--custom: {weird}",
+]
+
+SELECTORS = [
+    lambda: random.choice(TAGS),
+    lambda: random.choice(TAGS) + " " + random.choice(TAGS),
+    lambda: " ".join(random.choice(TAGS) for _ in range(3)),
+    # Selectors the parser can't read, whose whole rule has to be skipped.
+    lambda: random.choice(TAGS) + ":hover",
+    lambda: random.choice(TAGS) + " > " + random.choice(TAGS),
+]
+
+def generate_stylesheet(size: int) -> str:
+    random.seed(0)
+    rules = []
+    length = 0
+    while length < size:
+        selector = random.choice(SELECTORS)()
+        body = ";\n    ".join(random.sample(DECLARATIONS, random.randint(1, 6)))
+        rule = selector + " {\n    " + body + ";\n}\n\n"
+        rules.append(rule)
+        length += len(rule)
+    return "".join(rules)
+
+def describe_selector(selector: CSSSelector):
+    if isinstance(selector, DescendantSelector):
+        return (describe_selector(selector.ancestor), describe_selector(selector.descendant))
+    if isinstance(selector, TagSelector):
+        return selector.tag
+    return type(selector).__name__
+
+def describe(rules: List[CSSRule]) -> list:
+    return [(describe_selector(selector), selector.priority, dict(body)) for selector, body in rules]
+
+def throughput(parser_class: type, text: str, repeat: int = 3) -> Tuple[float, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        rules = parser_class(text).parse()
+        best = min(best, time.perf_counter() - start)
+    return len(rules) / best, len(text.encode("utf8")) / best / 1e6
+
+if __name__ == "__main__":
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    text = generate_stylesheet(int(size_mb * 1e6))
+
+    rules = CSSParser(text).parse()
+    print(f"Stylesheet: {len(text) / 1e6:.1f} MB, {len(rules)} rules")
+
+    assert describe(CharacterCSSParser(text).parse()) == describe(rules), \
+        "Parsers produced different rules"
+
+    old_rules, old_mbps = throughput(CharacterCSSParser, text)
+    new_rules, new_mbps = throughput(CSSParser, text)
+    print(f"  character parser: {old_rules:10.0f} rules/s {old_mbps:7.2f} MB/s")
+    print(f"  regex parser:     {new_rules:10.0f} rules/s {new_mbps:7.2f} MB/s ({new_mbps / old_mbps:.1f}x)")
@@ -0,0 +1,94 @@
+'''
+    Measures how many bytes each DOM node takes once a large generated
+    document has been parsed, with the compact slotted nodes and with the
+    original nodes, which each had a __dict__, a children list, an
+    attributes dict, and their own copy of every tag and attribute name.
+
+    Usage: python benchmarks/dom_memory_benchmark.py [size in MB]
+'''
+
+import gc
+import os
+import sys
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import hypertext.parser
+from hypertext.parser import HTMLParser
+from hypertext.utils import tree_to_list
+from html_parser_benchmark import generate_document
+
+class DictHTMLNode:
+    def __init__(self, parent) -> None:
+        self.parent = parent
+        self.children = []
+        self.is_focused = False
+
+    def add_child(self, node) -> None:
+        self.children.append(node)
+
+class DictElement(DictHTMLNode):
+    def __init__(self, tag, attributes, parent) -> None:
+        super().__init__(parent)
+        self.tag = tag
+        self.attributes = attributes
+
+class DictText(DictHTMLNode):
+    def __init__(self, text, parent) -> None:
+        super().__init__(parent)
+        self.text = text
+
+class DictHTMLParser(HTMLParser):
+    '''
+        Builds the original node representation: no interning, and a fresh
+        attributes dict for every element.
+    '''
+
+    def get_attributes(self, text: str):
+        parts = text.split()
+        tag = parts[0].casefold()
+        attributes = {}
+        for attrpair in parts[1:]:
+            if "=" in attrpair:
+                key, value = attrpair.split("=", 1)
+                if len(value) > 2 and value[0] in ["'", "\""]:
+                    value = value[1:-1]
+                attributes[key.casefold()] = value
+            else:
+                attributes[attrpair.casefold()] = ""
+        return tag, attributes
+
+@contextmanager
+def dict_nodes() -> Iterator[None]:
+    element, text = hypertext.parser.Element, hypertext.parser.Text
+    hypertext.parser.Element, hypertext.parser.Text = DictElement, DictText
+    try:
+        yield
+    finally:
+        hypertext.parser.Element, hypertext.parser.Text = element, text
+
+def bytes_per_node(parser_class: type, body: str) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    tree = parser_class(body).parse()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    nodes = len(tree_to_list(tree, []))
+    return size / nodes, nodes
+
+if __name__ == "__main__":
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    body = generate_document(int(size_mb * 1e6))
+
+    print(f"Document: {len(body) / 1e6:.1f} MB")
+
+    with dict_nodes():
+        before, nodes = bytes_per_node(DictHTMLParser, body)
+    after, _ = bytes_per_node(HTMLParser, body)
+
+    print(f"Nodes: {nodes}")
+    print(f"  original nodes: {before:7.1f} bytes/node")
+    print(f"  compact nodes:  {after:7.1f} bytes/node ({1 - after / before:.0%} smaller)")
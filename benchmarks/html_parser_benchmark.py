@@ -0,0 +1,114 @@
+'''
+    Measures HTMLParser throughput in MB/s on large generated documents, and
+    compares it with the original character-at-a-time tokenizer, both on its
+    own and as part of a full parse. Both must produce the same tree.
+
+    Usage: python benchmarks/html_parser_benchmark.py [size in MB]
+'''
+
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from hypertext.nodes import Element, HTMLNode, Text
+from hypertext.parser import HTMLParser
+
+class CharacterHTMLParser(HTMLParser):
+    '''
+        The original tokenizer, which builds text one character at a time.
+    '''
+
+    def parse(self) -> HTMLNode:
+        text = ""
+        in_tag = False
+        for c in self.body:
+            if c == "<":
+                in_tag = True
+                if text: self.add_text(text)
+                text = ""
+            elif c == ">":
+                in_tag = False
+                self.add_tag(text)
+                text = ""
+            else:
+                text += c
+        if not in_tag and text:
+            self.add_text(text)
+        return self.finish()
+
+def generate_document(size: int) -> str:
+    rows = []
+    length = 0
+    i = 0
+    while length < size:
+        row = (
+            f'<div class="card" id="card-{i}">'
+            f'<h2>Report section {i}</h2>'
+            f'<p style="color: gray">Generated paragraph <b>{i}</b> with some '
+            f'<i>inline</i> markup and a <a href="/item/{i}">link</a>.</p>'
+            f'<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do '
+            f'eiusmod tempor incididunt ut labore et dolore magna aliqua. Ut enim '
+            f'ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut '
+            f'aliquip ex ea commodo consequat.</p>'
+            f'<ul><li>first</li><li>second</li><li>third</li></ul>'
+            f'<input name=field{i} value=v{i}><br>'
+            f'</div>\n'
+        )
+        rows.append(row)
+        length += len(row)
+        i += 1
+    return "<!doctype html><html><head><title>Report</title></head><body>" \
+        + "".join(rows) + "</body></html>"
+
+def same_tree(a: HTMLNode, b: HTMLNode) -> bool:
+    stack = [(a, b)]
+    while stack:
+        a, b = stack.pop()
+        if type(a) is not type(b) or len(a.children) != len(b.children):
+            return False
+        if isinstance(a, Element) and (a.tag, a.attributes) != (b.tag, b.attributes):
+            return False
+        if isinstance(a, Text) and a.text != b.text:
+            return False
+        stack.extend(zip(a.children, b.children))
+    return True
+
+def throughput(parser_class: type, body: str, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        # Collect the previous tree first, so that every run starts with
+        # the same heap for the garbage collector to walk.
+        gc.collect()
+        start = time.perf_counter()
+        parser_class(body).parse()
+        best = min(best, time.perf_counter() - start)
+    return len(body.encode("utf8")) / best / 1e6
+
+def tokenizer_throughput(parser_class: type, body: str, repeat: int = 3) -> float:
+    '''
+        Measures the tokenizer alone, by not building a tree.
+    '''
+    class TokenizerOnly(parser_class):
+        def add_text(self, text: str) -> None: pass
+        def add_tag(self, tag: str) -> None: pass
+        def finish(self) -> None: pass
+    return throughput(TokenizerOnly, body, repeat)
+
+if __name__ == "__main__":
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 4
+    body = generate_document(int(size_mb * 1e6))
+
+    print(f"Document: {len(body) / 1e6:.1f} MB")
+
+    assert same_tree(CharacterHTMLParser(body).parse(), HTMLParser(body).parse()), \
+        "Tokenizers produced different trees"
+
+    for label, measure in [("Tokenizer only", tokenizer_throughput), ("Full parse", throughput)]:
+        old_mbps = measure(CharacterHTMLParser, body)
+        new_mbps = measure(HTMLParser, body)
+        print(f"{label}:")
+        print(f"  character tokenizer: {old_mbps:7.2f} MB/s")
+        print(f"  split tokenizer:     {new_mbps:7.2f} MB/s ({new_mbps / old_mbps:.1f}x)")
@@ -0,0 +1,76 @@
+'''
+    Measures how many selector matches per second the compiled matching
+    functions do, and compares them with the matches methods of the
+    selector classes. Each selector is tried against every element with
+    its rightmost tag in a large generated document, as the style computer
+    and querySelectorAll do. Both must agree on every element.
+
+    Usage: python benchmarks/selector_match_benchmark.py [size in MB]
+'''
+
+import gc
+import os
+import random
+import sys
+import time
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from css.parser import CSSParser
+from css.selectors import CSSSelector
+from hypertext.nodes import Element
+from hypertext.parser import HTMLParser
+from html_parser_benchmark import generate_document
+
+# Tags in the generated document, and some that aren't, so that some
+# ancestor walks have to go all the way up to the root.
+TAGS = ["html", "body", "div", "h2", "p", "b", "i", "a", "ul", "li", "nav", "section"]
+
+def generate_selectors(count: int) -> List[CSSSelector]:
+    random.seed(0)
+    return [
+        CSSParser(" ".join(random.choice(TAGS) for _ in range(random.randint(1, 4)))).selector()
+        for _ in range(count)]
+
+def interpreted(selector: CSSSelector) -> Callable[[Element], bool]:
+    return selector.matches
+
+def compiled(selector: CSSSelector) -> Callable[[Element], bool]:
+    return selector.compile()
+
+def run(pairs: List[Tuple[CSSSelector, List[Element]]], matcher: Callable) -> List[int]:
+    counts = []
+    for selector, candidates in pairs:
+        matches = matcher(selector)
+        counts.append(sum(1 for element in candidates if matches(element)))
+    return counts
+
+def throughput(pairs: List[Tuple[CSSSelector, List[Element]]], matcher: Callable,
+        repeat: int = 3) -> float:
+    calls = sum(len(candidates) for _, candidates in pairs)
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        run(pairs, matcher)
+        best = min(best, time.perf_counter() - start)
+    return calls / best
+
+if __name__ == "__main__":
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 1
+    parser = HTMLParser(generate_document(int(size_mb * 1e6)))
+    parser.parse()
+
+    selectors = generate_selectors(200)
+    pairs = [(selector, list(parser.index.elements_with_tag(selector.rightmost_tag)))
+        for selector in selectors]
+    print(f"Selectors: {len(selectors)}, matches tried: {sum(len(c) for _, c in pairs)}")
+
+    assert run(pairs, interpreted) == run(pairs, compiled), \
+        "Compiled selectors matched different elements"
+
+    old = throughput(pairs, interpreted)
+    new = throughput(pairs, compiled)
+    print(f"  selector classes:   {old:12.0f} matches/s")
+    print(f"  compiled selectors: {new:12.0f} matches/s ({new / old:.1f}x)")
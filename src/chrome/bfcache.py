@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from lru import MemoryLRU
+from traversal import pre_order
+from url.url import Url
+
+class PageSnapshot:
+    '''
+        Everything a tab needs to show a page again exactly as it was left:
+        the DOM, the JavaScript context, the style computer, the layout tree,
+        the display list, and the scroll position.
+    '''
+
+    # Rough memory cost of each kind of object, in bytes. These don't need
+    # to be exact, just good enough to keep the cache within its budget.
+    HTML_NODE_SIZE = 600
+    LAYOUT_NODE_SIZE = 500
+    DRAW_COMMAND_SIZE = 300
+
+    def __init__(self, tab) -> None:
+        self.url = tab.url
+        self.nodes = tab.nodes
+        self.index = tab.index
+        self.js = tab.js
+        self.preloads = tab.preloads
+        self.style_computer = tab.style_computer
+        self.document = tab.document
+        self.display_list = tab.display_list
+        self.scrollbar = tab.scrollbar
+        self.focus = tab.focus
+        self.timing = tab.timing
+        self.size = self.estimate_size()
+
+    def estimate_size(self) -> int:
+        html_nodes = 0
+        text_size = 0
+        for node in pre_order(self.nodes):
+            html_nodes += 1
+            text_size += len(getattr(node, "text", ""))
+        layout_nodes = sum(1 for _ in pre_order(self.document))
+
+        return html_nodes * self.HTML_NODE_SIZE + text_size \
+            + layout_nodes * self.LAYOUT_NODE_SIZE \
+            + len(self.display_list) * self.DRAW_COMMAND_SIZE
+
+    def restore(self, tab) -> None:
+        tab.url = self.url
+        tab.nodes = self.nodes
+        tab.index = self.index
+        tab.js = self.js
+        tab.preloads = self.preloads
+        tab.style_computer = self.style_computer
+        tab.document = self.document
+        tab.display_list = self.display_list
+        tab.scrollbar = self.scrollbar
+        tab.focus = self.focus
+        tab.timing = self.timing
+
+class BackForwardCache:
+    '''
+        Keeps recently left pages alive, keyed by their history entry, so
+        that navigating back to them can skip the network, parsing, scripts,
+        style, layout and paint. When the estimated size of all pages exceeds
+        MEMORY_BUDGET bytes, the least recently stored pages are evicted.
+    '''
+
+    MEMORY_BUDGET = 64 * 1024 * 1024
+
+    def __init__(self, memory_budget: int = MEMORY_BUDGET) -> None:
+        # Keyed by the history entry itself. Urls don't define equality,
+        # so two visits to the same address are different entries.
+        self.pages: MemoryLRU[PageSnapshot] = MemoryLRU(memory_budget, lambda page: page.size)
+
+    def store(self, entry: Url, page: PageSnapshot) -> None:
+        self.pages.put(entry, page)
+
+    def take(self, entry: Url) -> Optional[PageSnapshot]:
+        '''
+            Removes and returns the page for a history entry. The page is
+            about to be shown again, so the tab owns it from now on.
+        '''
+        return self.pages.pop(entry)
+
+    def discard(self, entry: Url) -> None:
+        self.take(entry)
+
+# Pages of every tab share one memory budget.
+BFCACHE = BackForwardCache()
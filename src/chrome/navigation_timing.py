@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Union
+
+from url.timing import ResourceTiming
+from url.url import Url
+
+class StageTiming:
+    def __init__(self, name: str, detail: Optional[str], start: float, end: float) -> None:
+        self.name = name
+        self.detail = detail
+        self.start = start
+        self.end = end
+
+class NavigationTiming:
+    '''
+        Records where the time goes while a tab loads a page: the network
+        phases of every resource it fetches, and each stage of the pipeline
+        from parsing to the first draw. Recording stops after the first draw,
+        so later re-renders don't clutter the waterfall.
+
+        to_dict() returns the result with all times in milliseconds relative
+        to the start of the navigation. The network part follows the "log"
+        layout of the HAR format, so it can be read by HAR viewers.
+    '''
+
+    def __init__(self, url: Url) -> None:
+        self.url = str(url)
+        self.start = time.perf_counter()
+        self.wall_start = time.time()
+        self.resources: List[ResourceTiming] = []
+        self.stages: List[StageTiming] = []
+        self.recording = True
+        self.lock = threading.Lock()
+
+    def resource(self, url: Url) -> ResourceTiming:
+        '''
+            Returns a new timing for a fetch of the URL. Fetches happen on
+            other threads, which fill in the timing as they go.
+        '''
+        timing = ResourceTiming(str(url))
+        with self.lock:
+            self.resources.append(timing)
+        return timing
+
+    @contextmanager
+    def stage(self, name: str, detail: Optional[str] = None) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        if self.recording:
+            self.stages.append(StageTiming(name, detail, start, time.perf_counter()))
+
+    def finish(self) -> None:
+        self.recording = False
+
+    def relative(self, timestamp: float) -> float:
+        return round((timestamp - self.start) * 1000, 3)
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            resources = list(self.resources)
+
+        return {
+            "url": self.url,
+            "startedDateTime": iso_datetime(self.wall_start),
+            "stages": [
+                {
+                    "name": stage.name,
+                    "detail": stage.detail,
+                    "start": self.relative(stage.start),
+                    "duration": round((stage.end - stage.start) * 1000, 3),
+                }
+                for stage in self.stages
+            ],
+            "log": {
+                "version": "1.2",
+                "creator": {"name": "MonarchBrowser", "version": "1.0.0"},
+                "entries": [self.har_entry(resource) for resource in resources],
+            },
+        }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as file:
+            file.write(self.to_json())
+
+    def har_entry(self, resource: ResourceTiming) -> Dict[str, Union[str, float, Dict]]:
+        # HAR uses -1 for phases that don't apply to a request.
+        def phase(start: str, end: str) -> float:
+            duration = resource.duration(start, end)
+            return -1 if duration is None else round(duration, 3)
+
+        marks = resource.marks
+        first_mark = min(marks.values()) if marks else resource.start
+        end = marks.get("body_complete", first_mark)
+
+        # In HAR, the connect time includes the TLS handshake.
+        connect_end = "tls_end" if "tls_end" in marks else "connect_end"
+
+        return {
+            "startedDateTime": iso_datetime(resource.wall_start),
+            "start": self.relative(resource.start),
+            "time": round((end - resource.start) * 1000, 3),
+            "request": {"url": resource.url},
+            "cache": {"state": resource.cache},
+            "connection": "reused" if resource.reused_connection else "new",
+            "timings": {
+                "blocked": round((first_mark - resource.start) * 1000, 3),
+                "dns": phase("dns_start", "dns_end"),
+                "connect": phase("connect_start", connect_end),
+                "ssl": phase("tls_start", "tls_end"),
+                "send": phase("send_start", "request_sent"),
+                "wait": phase("request_sent", "first_byte"),
+                "receive": phase("first_byte", "body_complete"),
+            },
+        }
+
+def iso_datetime(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
@@ -1,18 +1,26 @@
 from urllib import parse
 
 from tkinter import Event
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
+from chrome.bfcache import BFCACHE, PageSnapshot
+from chrome.navigation_timing import NavigationTiming
 from chrome.scrollbar import Scrollbar
 from constants import WINDOW_HEIGHT
 from css.style_computer import StyleComputer
-from hypertext.nodes import Element, Text, HTMLNode
+from hypertext.dom_cache import DOM_CACHE, document_hash
+from hypertext.index import DOMIndex, is_descendant
+from hypertext.nodes import Text, HTMLNode
 from hypertext.parser import HTMLParser
+from hypertext.preload_scanner import PreloadScanner
 from hypertext.utils import log_tree as log_html_tree
 from javascript.JSContext import JSContext
 from layout.document_layout_node import DocumentLayoutNode
 from layout.layout_node import LayoutNode
-from layout.utils import log_tree as log_layout_tree, tree_to_list
+from layout.utils import log_tree as log_layout_tree
+from traversal import pre_order
+from url.fetch_scheduler import SCHEDULER
+from url.response import Response
 from url.url import Url
 
 class Tab:
@@ -24,50 +32,111 @@ class Tab:
         self.height = WINDOW_HEIGHT - browser.chrome.bottom
         self.history: List[str] = []
         self.nodes = None
+        self.index = None
+        self.dom_snapshot = None
         self.style_computer = None
         self.focus = None
         self.js = None
+        self.preloads = None
+        self.document = None
+        self.timing = None
 
     def load(self, url: Url, payload: Optional[str] = None) -> None:
+        # Keep the page being left, in case the user navigates back to it.
+        self.save_page()
+
         self.history.append(url)
         self.scrollbar = None
         self.display_list = []
         self.url = url
 
+        # Record where the time goes during this navigation.
+        self.timing = NavigationTiming(url)
+
         # Initialize the JavaScript execution environment.
         self.js = JSContext(self)
 
         # Get HTML document, either from disk or the internet.
-        body = url.request(payload)
-
-        # Parse the HTML document, returning a tree of nodes.
-        self.nodes = HTMLParser(body).parse()
+        response = url.open(payload, self.timing.resource(url))
+
+        # Parse the HTML document as it arrives, returning a tree of nodes.
+        # Linked stylesheets and scripts start downloading as soon as the
+        # parser reaches their tags.
+        self.preloads = PreloadScanner(url, self.timing)
+        with self.timing.stage("html_parse"):
+            self.nodes, self.index = self.parse(response)
         
         # print("HTML tree:")
         # log_html_tree(self.nodes)
 
-        # Download stylesheets and initialize style computer.
-        self.style_computer = StyleComputer(self.nodes, self.url)
+        # Wait for stylesheets and initialize style computer.
+        with self.timing.stage("stylesheet_download"):
+            SCHEDULER.wait_all(self.preloads.stylesheet_fetches)
+        with self.timing.stage("stylesheet_parse"):
+            self.style_computer = StyleComputer(self.nodes, self.url, self.preloads, self.index)
 
-        # Get all scripts.
-        scripts = [node.attributes["src"] for node
-            in tree_to_list(self.nodes, [])
-            if isinstance(node, Element)
-            and node.tag == "script"
-            and "src" in node.attributes]
-        
-        # Download all scripts.
-        for script in scripts:
-            script_url = url.resolve(script)
+        # Scripts may change the tree, so the parsed-DOM cache has to have
+        # finished reading it first.
+        if self.preloads.script_urls:
+            self.finish_dom_snapshot()
+
+        # Run the scripts in document order as their downloads finish.
+        for script_url, script_fetch in zip(self.preloads.script_urls, self.preloads.script_fetches):
             try:
-                body = script_url.request()
+                body = script_fetch.result()
             except:
                 continue
 
-            self.js.run(body)
+            with self.timing.stage("script_execution", str(script_url)):
+                self.js.run(body)
 
         self.render()
 
+        # The user can change the tree from now on, too.
+        self.finish_dom_snapshot()
+
+    def parse(self, response: Response) -> Tuple[HTMLNode, DOMIndex]:
+        '''
+            Builds the HTML tree of a response. A document that is already on
+            hand is looked up in the parsed-DOM cache by a hash of its bytes
+            first, and only parsed if it hasn't been parsed before. One that
+            is still arriving over the network is parsed as it arrives.
+        '''
+        parser = HTMLParser(preload_scanner=self.preloads)
+        digest = document_hash(response.charset)
+
+        # Only a document that will be on hand again the next time it is
+        # loaded can ever be looked up, so only its tree is worth keeping.
+        worth_storing = response.buffered or response.stored
+
+        if response.buffered:
+            # Hash the raw bytes, without decoding them, so that a cached
+            # tree is found before any of the document is read as text.
+            response.hash_body(digest)
+            key = digest.hexdigest()
+            cached = DOM_CACHE.lookup(key, self.preloads)
+            if cached: return cached
+        else:
+            response = response.hashing(digest)
+
+        for chunk in response.iter_text():
+            parser.feed(chunk)
+        key = digest.hexdigest()
+
+        nodes = parser.close()
+        if worth_storing:
+            self.dom_snapshot = DOM_CACHE.store(key, nodes)
+        return nodes, parser.index
+
+    def finish_dom_snapshot(self) -> None:
+        '''
+            Waits until the parsed-DOM cache has read the tree it is storing
+            in the background, so that the tree can be changed.
+        '''
+        if self.dom_snapshot:
+            self.dom_snapshot.result()
+            self.dom_snapshot = None
+
     def render(self) -> None:
         '''
         Recompute style and layout, reinitialize scrollbar, and paint.
@@ -76,12 +145,14 @@ class Tab:
         self.display_list = []
 
         # Apply user agent, linked style sheet, and inline style rules
-        # to each element.
-        self.style_computer.compute_style(self.nodes)
+        # to each element whose style is missing or out of date.
+        with self.timing.stage("compute_style"):
+            self.style_computer.restyle(self.nodes)
 
         # From the HTML tree, produce a layout tree with a root DocumentLayoutNode.
-        self.document = DocumentLayoutNode(self.nodes)
-        self.document.layout()
+        with self.timing.stage("layout"):
+            self.document = DocumentLayoutNode(self.nodes)
+            self.document.layout()
 
         # print("Layout tree:")
         # log_layout_tree(self.document)
@@ -90,28 +161,31 @@ class Tab:
         self.scrollbar = Scrollbar(self)
 
         # From the layout tree, produce a linear list of draw commands.
-        self.paint(self.document, self.display_list)
+        with self.timing.stage("paint"):
+            self.paint(self.document, self.display_list)
 
         # print("Draw commands:")
         # for command in self.display_list:
         #     print(command)
 
     def draw(self, e: Optional[Event] = None) -> None:
-        # Draw the scrollbar.
-        self.scrollbar.draw(e)
+        with self.timing.stage("first_draw"):
+            # Draw the scrollbar.
+            self.scrollbar.draw(e)
 
-        # Draw the web page.
-        for command in self.display_list:
-            if command.rect.top > self.scrollbar.scroll + WINDOW_HEIGHT: continue
-            if command.rect.bottom < self.scrollbar.scroll: continue
-            command.execute(self.browser.canvas, self.scrollbar.scroll - self.browser.chrome.bottom)
+            # Draw the web page.
+            for command in self.display_list:
+                if command.rect.top > self.scrollbar.scroll + WINDOW_HEIGHT: continue
+                if command.rect.bottom < self.scrollbar.scroll: continue
+                command.execute(self.browser.canvas, self.scrollbar.scroll - self.browser.chrome.bottom)
 
-    def paint(self, layout_object: LayoutNode, display_list: List[LayoutNode]) -> None:
-        if layout_object.should_paint():
-            self.display_list.extend(layout_object.paint())
+        # The navigation is complete once the page has been drawn.
+        self.timing.finish()
 
-        for child in layout_object.children:
-            self.paint(child, display_list)
+    def paint(self, layout_object: LayoutNode, display_list: List[LayoutNode]) -> None:
+        for obj in pre_order(layout_object):
+            if obj.should_paint():
+                display_list.extend(obj.paint())
 
     def scroll_down(self) -> None:
         self.scrollbar.scroll_down()
@@ -127,8 +201,7 @@ class Tab:
         y += self.scrollbar.scroll
 
         # Perform a hit test. Get the list of layout objects that have been clicked.
-        tree = tree_to_list(self.document, [])
-        objs = [obj for obj in tree
+        objs = [obj for obj in pre_order(self.document)
             if obj.x <= x < obj.x + obj.width
             and obj.y <= y < obj.y + obj.height]
         
@@ -153,11 +226,13 @@ class Tab:
                 # Don't do default behavior.
                 if self.js.dispatch_event("click", elt): return
                 
-                elt.attributes["value"] = ""
+                self.index.set_attribute(elt, "value", "")
                 if self.focus:
                     self.focus.is_focused = False
+                    self.focus.invalidate_style()
                 self.focus = elt
                 elt.is_focused = True
+                elt.invalidate_style()
                 self.render()
             elif elt.tag == "button":
                 # Don't do default behavior.
@@ -173,10 +248,9 @@ class Tab:
     def submit_form(self, elt: HTMLNode) -> None:
         self.js.dispatch_event("submit", elt)
         # Get all inputs of the form.
-        inputs = [node for node in tree_to_list(elt, [])
-            if isinstance(node, Element)
-            and node.tag == "input"
-            and "name" in node.attributes]
+        inputs = [node for node in self.index.elements_with_tag("input")
+            if "name" in node.attributes
+            and is_descendant(node, elt)]
         body = ""
 
         for input in inputs:
@@ -197,14 +271,37 @@ class Tab:
 
     def go_back(self) -> None:
         if len(self.history) > 1:
-            self.history.pop()
+            current = self.history.pop()
             back = self.history.pop()
-            self.load(back)
+
+            # The current page is no longer in the history, so nothing
+            # can navigate to it again.
+            BFCACHE.discard(current)
+
+            page = BFCACHE.take(back)
+            if page:
+                # Show the page exactly as it was left, without fetching,
+                # parsing, running scripts, or rendering it again.
+                self.history.append(back)
+                page.restore(self)
+            else:
+                self.load(back)
+
+    def save_page(self) -> None:
+        '''
+            Stores the current page in the back/forward cache, if it can
+            still be navigated to from the history.
+        '''
+        if self.nodes is None or self.document is None: return
+        if not any(entry is self.url for entry in self.history): return
+
+        BFCACHE.store(self.url, PageSnapshot(self))
 
     def keypress(self, char: str) -> None:
         if self.focus:
             # Don't do default behavior.
             if self.js.dispatch_event("keydown", self.focus): return
             
-            self.focus.attributes["value"] += char
+            value = self.focus.attributes.get("value", "")
+            self.index.set_attribute(self.focus, "value", value + char)
             self.render()
\ No newline at end of file
@@ -0,0 +1,26 @@
+from typing import Dict, Iterable
+
+# A Bloom filter of tag names, kept in the bits of an int. Each tag sets
+# HASHES of the FILTER_BITS bits. A filter that lacks any bit of a tag
+# certainly doesn't contain it; one that has them all probably does.
+FILTER_BITS = 256
+HASHES = 2
+
+tag_bits_cache: Dict[str, int] = {}
+
+def tag_bits(tag: str) -> int:
+    bits = tag_bits_cache.get(tag)
+    if bits is None:
+        h = hash(tag)
+        bits = 0
+        for _ in range(HASHES):
+            bits |= 1 << (h % FILTER_BITS)
+            h //= FILTER_BITS
+        tag_bits_cache[tag] = bits
+    return bits
+
+def tags_bits(tags: Iterable[str]) -> int:
+    bits = 0
+    for tag in tags:
+        bits |= tag_bits(tag)
+    return bits
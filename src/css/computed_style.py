@@ -0,0 +1,40 @@
+from typing import Optional, Tuple
+
+# A Tk font, as the size in points, the weight and the slant.
+FontKey = Tuple[int, str, str]
+
+def normalize_color(color: str) -> str:
+    # Tk color names and hex digits are case-insensitive.
+    return color.strip().casefold()
+
+class ComputedStyle(dict):
+    '''
+        The computed value of each of a node's CSS properties, as strings,
+        along with the values layout and paint need, resolved from them once
+        by resolve() so that they don't have to be parsed for every word.
+    '''
+
+    __slots__ = ("font_size", "font_key", "color", "background_color")
+
+    def resolve(self) -> None:
+        # The font size, in CSS pixels.
+        self.font_size = float(self["font-size"][:-2])
+
+        weight = self["font-weight"]
+        style = self["font-style"]
+
+        # Translate CSS "normal" to Tk "roman".
+        if style == "normal": style = "roman"
+
+        # Translate CSS "900" to Tk "bold".
+        if weight == "900": weight = "bold"
+
+        # Convert CSS pixels to Tk points.
+        self.font_key = (int(self.font_size * 0.75), weight, style)
+
+        self.color = normalize_color(self["color"])
+
+        # None if there is no background to paint.
+        background_color = normalize_color(self.get("background-color", "transparent"))
+        self.background_color: Optional[str] = \
+            None if background_color == "transparent" else background_color
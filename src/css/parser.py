@@ -1,3 +1,4 @@
+import re
 from typing import Dict, List, Tuple
 
 from css.selectors import CSSSelector, TagSelector, DescendantSelector
@@ -5,6 +6,20 @@ from css.selectors import CSSSelector, TagSelector, DescendantSelector
 CSSDeclarations = Dict[str, str]
 CSSRule = Tuple[CSSSelector, CSSDeclarations]
 
+# Rather than stepping through the text one character at a time, the parser
+# matches whole runs of characters with these. A word character is one for
+# which str.isalnum() is true, or one of "#-.%"; [^\W_] is exactly the
+# characters for which isalnum() is true.
+WORD_PATTERN = r"(?:[^\W_]|[#\-.%])+"
+
+WHITESPACE = re.compile(r"\s*")
+
+# A "property: value" pair, with the whitespace and semicolon that end it.
+DECLARATION = re.compile(rf"({WORD_PATTERN})\s*:\s*({WORD_PATTERN})\s*(?:;\s*)?")
+
+# Words separated by whitespace, and the whitespace after them.
+SELECTOR = re.compile(rf"{WORD_PATTERN}(?:\s+{WORD_PATTERN})*\s*")
+
 class CSSParser:
 
     def __init__(self, s: str) -> None:
@@ -12,65 +27,59 @@ class CSSParser:
         self.i = 0
 
     def whitespace(self) -> None:
-        while self.i < len(self.s) and self.s[self.i].isspace():
-            self.i += 1
+        self.i = WHITESPACE.match(self.s, self.i).end()
 
-    def word(self) -> str:
-        start = self.i
-
-        while self.i < len(self.s):
-            if self.s[self.i].isalnum() or self.s[self.i] in "#-.%":
-                # Increment i through any word characters
-                self.i += 1
-            else:
-                break
-        
-        if not (self.i > start):
-            raise Exception("Parsing error")
-        
-        return self.s[start:self.i]
-    
     def literal(self, literal: str) -> None:
         if not (self.i < len(self.s) and self.s[self.i] == literal):
             raise Exception("Parsing error")
         self.i += 1
 
-    def pair(self) -> Tuple[str, str]:
-        prop = self.word()
-        self.whitespace()
-        self.literal(":")
-        self.whitespace()
-        val = self.word()
-        return prop.casefold(), val
-    
     def body(self) -> CSSDeclarations:
         pairs = {}
 
         while self.i < len(self.s) and self.s[self.i] != "}":
-            try:
-                prop, val = self.pair()
+            # Most declarations are well-formed, so read each one, and the
+            # semicolon after it, in one step.
+            match = DECLARATION.match(self.s, self.i)
+            if match:
+                prop, val = match.group(1, 2)
                 pairs[prop.casefold()] = val
-                self.whitespace()
-            except Exception:
-                # Skip any parse errors (ignore anything we don't understand).
-                why = self.ignore_until([";", "}"])
+                self.i = match.end()
+                continue
 
-                if why == ";":
-                    self.literal(";")
-                    self.whitespace()
-                else:
-                    break
+            # Skip any parse errors (ignore anything we don't understand).
+            # Nothing a declaration can start with is a ";" or a "}", so
+            # the search finds the same one from here as from wherever
+            # the declaration went wrong.
+            why = self.ignore_until([";", "}"])
+
+            if why == ";":
+                self.literal(";")
+                self.whitespace()
+            else:
+                break
         
         return pairs
     
     def selector(self) -> CSSSelector:
-        out = TagSelector(self.word().casefold())
-        self.whitespace()
-        while self.i < len(self.s) and self.s[self.i] != "{":
-            tag = self.word()
+        match = SELECTOR.match(self.s, self.i)
+        if not match:
+            raise Exception("Parsing error")
+        self.i = match.end()
+
+        # The words must run up to the body, or the end of the text.
+        if self.i < len(self.s) and self.s[self.i] != "{":
+            raise Exception("Parsing error")
+
+        tags = match.group().split()
+        out = TagSelector(tags[0].casefold())
+        for tag in tags[1:]:
             descendant = TagSelector(tag.casefold())
             out = DescendantSelector(out, descendant)
-            self.whitespace()
+
+        # Every rule's selector is tried against many elements, so build its
+        # matching function now.
+        out.compile()
         return out
 
     def parse(self) -> List[CSSRule]:
@@ -94,10 +103,11 @@ class CSSParser:
         return rules
 
     def ignore_until(self, chars: str) -> str | None: 
-        while self.i < len(self.s):
-            if self.s[self.i] in chars:
-                return self.s[self.i]
-            else:
-                self.i += 1
-        return None
+        # Jump straight to the nearest of the characters.
+        found = [i for i in (self.s.find(c, self.i) for c in chars) if i >= 0]
+        if not found:
+            self.i = len(self.s)
+            return None
+        self.i = min(found)
+        return self.s[self.i]
     
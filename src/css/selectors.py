@@ -1,14 +1,62 @@
+import sys
+from typing import Callable, Optional, Tuple
+
 from hypertext.nodes import HTMLNode, Element
 
+# A function that tells whether a selector matches an element.
+Matcher = Callable[[Element], bool]
+
 class CSSSelector:
     def __init__(self, priority: int) -> None:
         self.priority = priority
+        self.compiled: Optional[Matcher] = None
+
+    def compile(self) -> Matcher:
+        '''
+            Returns a function specialized to this selector that does what
+            matches does for an element, without walking the selector
+            objects on every call. It is built once, and kept.
+        '''
+        if self.compiled is None:
+            self.compiled = compile_selector(self)
+        return self.compiled
+
+    @property
+    def rightmost_tag(self) -> Optional[str]:
+        '''
+            The tag an element must have for the selector to match it, or
+            None if it could match elements with any tag.
+        '''
+        return None
+
+    @property
+    def tags(self) -> Tuple[str, ...]:
+        '''
+            Every tag named in the selector.
+        '''
+        return ()
+
+    @property
+    def ancestor_tags(self) -> Tuple[str, ...]:
+        '''
+            The tags that some ancestor of an element must have for the
+            selector to match it.
+        '''
+        return ()
 
 class TagSelector(CSSSelector):
     def __init__(self, tag: str) -> None:
         super().__init__(1)
         self.tag = tag
 
+    @property
+    def rightmost_tag(self) -> Optional[str]:
+        return self.tag
+
+    @property
+    def tags(self) -> Tuple[str, ...]:
+        return (self.tag,)
+
     def matches(self, node: HTMLNode) -> bool:
         return isinstance(node, Element) and self.tag == node.tag
 
@@ -17,10 +65,65 @@ class DescendantSelector(CSSSelector):
         super().__init__(ancestor.priority + descendant.priority)
         self.ancestor = ancestor
         self.descendant = descendant
+
+    @property
+    def rightmost_tag(self) -> Optional[str]:
+        return self.descendant.rightmost_tag
+
+    @property
+    def tags(self) -> Tuple[str, ...]:
+        return self.ancestor.tags + self.descendant.tags
+
+    @property
+    def ancestor_tags(self) -> Tuple[str, ...]:
+        return self.ancestor.tags + self.descendant.ancestor_tags
     
     def matches(self, node: HTMLNode) -> bool:
         if not self.descendant.matches(node): return False
         while node.parent:
             if self.ancestor.matches(node.parent): return True
             node = node.parent
-        return False
\ No newline at end of file
+        return False
+
+def compile_selector(selector: CSSSelector) -> Matcher:
+    # Only chains of tags joined by descendant combinators can be compiled.
+    parts = []
+    while isinstance(selector, DescendantSelector) and isinstance(selector.descendant, TagSelector):
+        parts.append(selector.descendant.tag)
+        selector = selector.ancestor
+    if not isinstance(selector, TagSelector): return selector.matches
+    parts.append(selector.tag)
+
+    # Element tags are interned, so interned selector tags can be compared
+    # by identity.
+    tag, *ancestors = [sys.intern(part) for part in parts]
+
+    if not ancestors:
+        def matches(element: Element) -> bool:
+            return element.tag is tag
+        return matches
+
+    if len(ancestors) == 1:
+        ancestor, = ancestors
+        def matches(element: Element) -> bool:
+            if element.tag is not tag: return False
+            node = element.parent
+            while node is not None:
+                if node.tag is ancestor: return True
+                node = node.parent
+            return False
+        return matches
+
+    # Find each ancestor tag, from right to left, above the last one found.
+    # The nearest match is always the best choice, since it leaves the most
+    # ancestors for the tags further left.
+    def matches(element: Element) -> bool:
+        if element.tag is not tag: return False
+        node = element.parent
+        for ancestor in ancestors:
+            while node is not None and node.tag is not ancestor:
+                node = node.parent
+            if node is None: return False
+            node = node.parent
+        return True
+    return matches
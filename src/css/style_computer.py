@@ -1,8 +1,16 @@
-import os
-from typing import List
+from typing import Dict, Hashable, List, Optional, Tuple, Union
 
-from css.parser import CSSParser, CSSRule
-from hypertext.nodes import Element, HTMLNode
+from css.bloom import tag_bits, tags_bits
+from css.computed_style import ComputedStyle
+from css.parser import CSSDeclarations, CSSRule
+from css.selectors import Matcher
+from css.stylesheet_cache import DECLARATION_CACHE, STYLESHEET_CACHE
+from hypertext.index import DOMIndex
+from hypertext.nodes import Element, HTMLNode, Text
+from hypertext.preload_scanner import PreloadScanner
+from traversal import pre_order
+from url.fetch_scheduler import SCHEDULER
+from url.url import Url
 
 INHERITED_PROPERTIES = {
     "font-size": "16px",
@@ -11,15 +19,113 @@ INHERITED_PROPERTIES = {
     "color": "black",
 }
 
+# A rule, as its compiled selector, with a Bloom filter of the tags the
+# selector needs ancestors to have.
+BucketedRule = Tuple[Matcher, CSSDeclarations, int]
+
 class StyleComputer:
 
-    def __init__(self, html: HTMLNode, url: str) -> None:
+    def __init__(self, html: HTMLNode, url: Url, preloads: Optional[PreloadScanner] = None,
+            index: Optional[DOMIndex] = None) -> None:
         self.html = html
         self.url = url
+        self.preloads = preloads
+        self.index = index
         self.rules = sorted(self.get_rules(), key=self.cascade_priority)
+        self.rule_buckets = self.bucket_rules(self.rules)
+
+        # How often compute_style found a style to share, over all calls.
+        self.sharing_hits = 0
+        self.sharing_misses = 0
+
+    def restyle(self, tree: HTMLNode) -> None:
+        '''
+            Computes the styles that are missing from a tree, because its
+            nodes are new or have been invalidated, leaving the rest as they
+            are. Only the paths down to the invalidated nodes are walked.
+        '''
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if node.style is None:
+                self.compute_style(node)
+            elif node.child_needs_style:
+                node.child_needs_style = False
+                stack.extend(node.children)
+
+    def compute_style(self, tree: HTMLNode) -> None:
+        # Bloom filters of the tags of each element's ancestors, and the
+        # element itself, for its children to start from.
+        filters: Dict[HTMLNode, int] = {}
+
+        # Styles computed so far, by everything they were computed from,
+        # so that nodes with the same inputs can share one style.
+        shared: Dict[Hashable, Dict[str, str]] = {}
+
+        # Parents come before their children, so every node can inherit
+        # from its parent's finished style.
+        for node in pre_order(tree):
+            if node is tree:
+                ancestors = self.ancestor_filter(node)
+            else:
+                ancestors = filters[node.parent]
+
+            node.child_needs_style = False
+
+            key = self.sharing_key(node)
+            style = shared.get(key)
+            if style is None:
+                self.sharing_misses += 1
+                self.compute_node_style(node, ancestors)
+                shared[key] = node.style
+            else:
+                self.sharing_hits += 1
+                node.style = style
+
+            if node.children:
+                filters[node] = ancestors | tag_bits(node.tag)
+
+    def sharing_key(self, node: HTMLNode) -> Hashable:
+        '''
+            Returns what a node's style is computed from. Two nodes with
+            the same key get equal styles, so they can share one.
 
-    def compute_style(self, node: HTMLNode) -> None:
-        node.style = {}
+            A node's style depends on its tag, its style attribute and its
+            parent's style, and through descendant selectors on the tags of
+            its ancestors. Selectors only look at tags, so no other attribute
+            makes a difference. Nodes only share a style object if they have
+            the same tag and the same parent style, which in turn means they
+            have the same ancestor tags. Parent styles are compared by
+            identity, which is cheap and stays valid for the whole pass,
+            since every style in the key belongs to a live node.
+        '''
+        parent_style = id(node.parent.style) if node.parent else None
+        if isinstance(node, Text):
+            return parent_style
+        return (node.tag, node.attributes.get("style"), parent_style)
+
+    def sharing_stats(self) -> Dict[str, Union[int, float]]:
+        total = self.sharing_hits + self.sharing_misses
+        return {
+            "hits": self.sharing_hits,
+            "misses": self.sharing_misses,
+            "hit_rate": self.sharing_hits / total if total else 0.0,
+        }
+
+    def ancestor_filter(self, node: HTMLNode) -> int:
+        bits = 0
+        while node.parent:
+            node = node.parent
+            bits |= tag_bits(node.tag)
+        return bits
+
+    def compute_node_style(self, node: HTMLNode, ancestors: int) -> None:
+        '''
+            Computes the style of a node, whose parent's style has already
+            been computed. Ancestors is a Bloom filter of the tags of the
+            node's ancestors.
+        '''
+        node.style = ComputedStyle()
 
         # Apply inherited properties to the node.
         for property, default_value in INHERITED_PROPERTIES.items():
@@ -28,15 +134,21 @@ class StyleComputer:
             else:
                 node.style[property] = default_value
 
-        # Apply style sheet rules to the node.
-        for selector, body in self.rules:
-            if not selector.matches(node): continue
-            for property, value in body.items():
-                node.style[property] = value
+        # Apply style sheet rules to the node. Only elements can match a
+        # selector, and only rules in the bucket for their tag need to be tried.
+        if isinstance(node, Element):
+            rules = self.rule_buckets.get(node.tag, self.rule_buckets[None])
+            for matches, body, required in rules:
+                # Skip walking up the tree when the filter shows that some
+                # tag the selector needs is missing from the ancestors.
+                if required & ancestors != required: continue
+                if not matches(node): continue
+                for property, value in body.items():
+                    node.style[property] = value
 
         # Apple style attribute rules to the node.
         if isinstance(node, Element) and "style" in node.attributes:
-            pairs = CSSParser(node.attributes["style"]).body()
+            pairs = DECLARATION_CACHE.parse(node.attributes["style"])
 
             for property, value in pairs.items():
                 node.style[property] = value
@@ -44,43 +156,72 @@ class StyleComputer:
         # Resolve font-size percentages to absolute pixel units.
         if node.style["font-size"].endswith("%"):
             if node.parent:
-                parent_font_size = node.parent.style["font-size"]
+                parent_px = node.parent.style.font_size
             else:
-                parent_font_size = INHERITED_PROPERTIES["font-size"]
+                parent_px = float(INHERITED_PROPERTIES["font-size"][:-2])
             node_pct = float(node.style["font-size"][:-1]) / 100
-            parent_px = float(parent_font_size[:-2])
             node.style["font-size"] = str(node_pct * parent_px) + "px"
 
-        # Compute style of children.
-        for child in node.children:
-            self.compute_style(child)
+        # Work out the typed values layout and paint will use.
+        node.style.resolve()
     
+    def bucket_rules(self, rules: List[CSSRule]) -> Dict[Optional[str], List[BucketedRule]]:
+        '''
+            Groups rules by the tag of their rightmost selector, which an
+            element must have for the rule to match it. Rules that could
+            match any tag are in the None bucket, and also in every other
+            bucket, so that each bucket holds all the rules an element with
+            that tag could match, still in cascade order.
+        '''
+        buckets: Dict[Optional[str], List[BucketedRule]] = {None: []}
+        for selector, _ in rules:
+            buckets.setdefault(selector.rightmost_tag, [])
+
+        for selector, body in rules:
+            rule = (selector.compile(), body, tags_bits(selector.ancestor_tags))
+            tag = selector.rightmost_tag
+            if tag is None:
+                for bucket in buckets.values():
+                    bucket.append(rule)
+            else:
+                buckets[tag].append(rule)
+        return buckets
+
     def get_rules(self) -> List[CSSRule]:
         rules = self.get_user_agent_rules()
         rules.extend(self.get_linked_stylesheet_rules())
         return rules
     
     def get_user_agent_rules(self) -> List[CSSRule]:
-        default_stylesheet_path = os.path.join(os.path.dirname(__file__), "browser.css")
-        default_stylesheet_content = open(default_stylesheet_path).read()
-        rules = CSSParser(default_stylesheet_content).parse().copy()
-        return rules
+        # The user agent stylesheet is only parsed once per process.
+        return list(STYLESHEET_CACHE.user_agent_rules())
             
     def get_linked_stylesheet_rules(self) -> List[CSSRule]:
         rules = []
-        for link in self.get_linked_stylesheets():
-            style_url = self.url.resolve(link)
-            try:
-                body = style_url.request()
-            except:
-                # Ignore stylesheets that fail to download.
-                continue
-
-            rules.extend(CSSParser(body).parse())
+
+        if self.preloads:
+            # The stylesheets started downloading while the HTML was parsed.
+            style_urls = self.preloads.stylesheet_urls
+            bodies = SCHEDULER.wait_all(self.preloads.stylesheet_fetches)
+        else:
+            style_urls = [self.url.resolve(link) for link in self.get_linked_stylesheets()]
+            bodies = SCHEDULER.fetch_all(style_urls)
+
+        # Download all stylesheets at once, but add their rules in document
+        # order so that later stylesheets still override earlier ones.
+        for style_url, body in zip(style_urls, bodies):
+            # Ignore stylesheets that fail to download.
+            if body is None: continue
+
+            # Pages that share a stylesheet share its parsed rules.
+            rules.extend(STYLESHEET_CACHE.rules(str(style_url), body))
         return rules
     
     def get_linked_stylesheets(self) -> List[str]:
-        node_list = self.tree_to_list(self.html, [])
+        if self.index:
+            node_list = self.index.elements_with_tag("link")
+        else:
+            node_list = pre_order(self.html)
         links = []
         for node in node_list:
             if isinstance(node, Element) \
@@ -90,12 +231,6 @@ class StyleComputer:
                 links.append(node.attributes["href"])
         return links
 
-    def tree_to_list(self, tree: HTMLNode, list: List[HTMLNode]) -> List[HTMLNode]:
-        list.append(tree)
-        for child in tree.children:
-            self.tree_to_list(child, list)
-        return list
-    
     def cascade_priority(self, rule: CSSRule) -> int:
         selector, body = rule
         return selector.priority
\ No newline at end of file
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple, Union
+
+from css.parser import CSSParser, CSSRule
+from lru import MemoryLRU
+
+USER_AGENT_STYLESHEET = os.path.join(os.path.dirname(__file__), "browser.css")
+
+# Parsed rules are shared by every style computer that uses them, so they
+# are kept in a tuple, with read-only declarations.
+ParsedStylesheet = Tuple[CSSRule, ...]
+
+def freeze(rules: list) -> ParsedStylesheet:
+    return tuple((selector, MappingProxyType(body)) for selector, body in rules)
+
+class StylesheetCache:
+    '''
+        Parses each stylesheet once per process. The user agent stylesheet
+        is parsed the first time it is needed. Linked stylesheets are keyed
+        by their URL and a hash of their text, so that pages sharing a
+        stylesheet share its parsed rules, and a stylesheet that changes is
+        parsed again. When the text of all cached stylesheets exceeds
+        MEMORY_BUDGET characters, the least recently used are evicted.
+    '''
+
+    MEMORY_BUDGET = 8 * 1024 * 1024
+
+    def __init__(self, memory_budget: int = MEMORY_BUDGET) -> None:
+        self.user_agent: Optional[ParsedStylesheet] = None
+
+        # Each stylesheet is kept with the length of its text.
+        self.linked: MemoryLRU[Tuple[ParsedStylesheet, int]] = \
+            MemoryLRU(memory_budget, lambda entry: entry[1])
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def user_agent_rules(self) -> ParsedStylesheet:
+        with self.lock:
+            if self.user_agent is None:
+                with open(USER_AGENT_STYLESHEET) as file:
+                    self.user_agent = freeze(CSSParser(file.read()).parse())
+            return self.user_agent
+
+    def rules(self, url: str, body: str) -> ParsedStylesheet:
+        key = (url, hashlib.sha256(body.encode("utf8")).hexdigest())
+
+        with self.lock:
+            entry = self.linked.get(key)
+            if entry:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        # Parse outside the lock. Two tabs parsing the same stylesheet at
+        # once both store the same rules.
+        rules = freeze(CSSParser(body).parse())
+
+        with self.lock:
+            self.linked.put(key, (rules, len(body)))
+        return rules
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.linked),
+                "size": self.linked.size,
+            }
+
+class DeclarationCache:
+    '''
+        Parses the declarations in style attributes, like "color: red",
+        once for each distinct attribute value, and shares the read-only
+        result between every element with the same value. Changing an
+        attribute changes the key, so there is nothing to invalidate. At
+        most MAX_ENTRIES values are kept, evicting the least recently used.
+    '''
+
+    MAX_ENTRIES = 4096
+
+    def __init__(self, max_entries: int = MAX_ENTRIES) -> None:
+        # Every value counts as one entry, whatever its length.
+        self.declarations: MemoryLRU[Mapping[str, str]] = MemoryLRU(max_entries, size=lambda _: 1)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, text: str) -> Mapping[str, str]:
+        with self.lock:
+            declarations = self.declarations.get(text)
+            if declarations is not None:
+                self.hits += 1
+                return declarations
+            self.misses += 1
+
+        declarations = MappingProxyType(CSSParser(text).body())
+
+        with self.lock:
+            self.declarations.put(text, declarations)
+        return declarations
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self.declarations),
+            }
+
+# Parsed stylesheets and style attributes are shared by every tab in the
+# process.
+STYLESHEET_CACHE = StylesheetCache()
+DECLARATION_CACHE = DeclarationCache()
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import gc
+import hashlib
+import marshal
+import os
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+
+from hypertext.index import DOMIndex
+from hypertext.nodes import Element, HTMLNode, Text
+from lru import DiskLRU, MemoryLRU
+from traversal import pre_order
+
+if TYPE_CHECKING:
+    from hypertext.preload_scanner import PreloadScanner
+
+# Changes whenever the parser would build a different tree from the same
+# text, or the serialized form changes, so that old entries stop matching.
+FORMAT_VERSION = b"dom-3\n"
+
+def document_hash(charset: str):
+    '''
+        Returns a sha256 hash for a document in the given charset, to be
+        extended with update() with the raw bytes of the document as they
+        are read. Its hexdigest() is the key of the document's tree in the
+        cache. Hashing the bytes, rather than the decoded text, means a
+        document can be looked up without decoding it.
+    '''
+    digest = hashlib.sha256(FORMAT_VERSION)
+    digest.update(charset.encode("ascii") + b"\n")
+    return digest
+
+# A record of a node: an element's tag, attributes and number of children,
+# or a text node's text.
+Record = Union[Tuple[str, Optional[Dict[str, str]], int], str]
+
+def tree_records(tree: HTMLNode) -> List[Record]:
+    '''
+        Flattens a tree into a list of records in document order. Each
+        element's children follow it.
+    '''
+    records: List[Record] = []
+    for node in pre_order(tree):
+        if isinstance(node, Element):
+            # Most elements have no attributes, and None is cheaper to
+            # unmarshal than an empty dict.
+            attributes = dict(node.attributes) if node.attributes else None
+            records.append((node.tag, attributes, len(node.children)))
+        else:
+            records.append(node.text)
+    return records
+
+def serialize_records(records: List[Record]) -> bytes:
+    # Tags and attribute names are interned, so marshal writes each one
+    # only once. Markup is repetitive, so even the fastest compression
+    # makes the result much smaller than the document.
+    return zlib.compress(marshal.dumps(records), 1)
+
+def deserialize_tree(
+    data: bytes,
+    preload_scanner: Optional[PreloadScanner] = None
+) -> Tuple[HTMLNode, DOMIndex]:
+    '''
+        Rebuilds a tree from serialize_records(), indexing its elements and
+        showing them to the preload scanner in the same order the parser
+        would have.
+    '''
+    records = marshal.loads(zlib.decompress(data))
+
+    # Every node is in a reference cycle with its parent, so building the
+    # tree sets off the cyclic garbage collector again and again, which
+    # then searches the whole growing tree for garbage it doesn't contain.
+    # That takes longer than building the tree.
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        return build_tree(records, preload_scanner)
+    finally:
+        if collecting: gc.enable()
+
+def build_tree(
+    records: List[Record],
+    preload_scanner: Optional[PreloadScanner] = None
+) -> Tuple[HTMLNode, DOMIndex]:
+    index = DOMIndex()
+    root = None
+
+    # The elements still waiting for children, and how many each expects.
+    open_elements: List[Element] = []
+    remaining: List[int] = []
+
+    for record in records:
+        parent = open_elements[-1] if open_elements else None
+
+        if isinstance(record, str):
+            node = Text(record, parent)
+            child_count = 0
+        else:
+            tag, attributes, child_count = record
+            node = Element(tag, attributes, parent)
+            index.add(node)
+            if preload_scanner:
+                preload_scanner.scan(node.tag, node.attributes)
+
+        if parent is None:
+            root = node
+        else:
+            parent.add_child(node)
+            remaining[-1] -= 1
+
+        if child_count:
+            open_elements.append(node)
+            remaining.append(child_count)
+
+        while remaining and remaining[-1] == 0:
+            open_elements.pop()
+            remaining.pop()
+
+    index.root = root
+    return root, index
+
+class DOMCache:
+    '''
+        A two-tier cache of parsed HTML trees, keyed by a hash of the
+        document's bytes, so that a document that has been parsed before can
+        be rebuilt without tokenizing it again. Trees are kept serialized,
+        since every load needs a fresh copy that scripts are free to change.
+        They are serialized and written on a background thread, off the
+        page load.
+
+        Recently used trees are kept in memory, up to MEMORY_BUDGET bytes,
+        and every tree is also written to disk, up to DISK_BUDGET bytes, so
+        that it survives a restart. When a budget is exceeded, the least
+        recently used trees are evicted first.
+    '''
+
+    MEMORY_BUDGET = 32 * 1024 * 1024
+    DISK_BUDGET = 256 * 1024 * 1024
+    DISK_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "monarch-browser", "dom")
+
+    def __init__(
+        self,
+        memory_budget: int = MEMORY_BUDGET,
+        disk_budget: int = DISK_BUDGET,
+        disk_directory: Optional[str] = DISK_DIRECTORY
+    ) -> None:
+        self.memory: MemoryLRU[bytes] = MemoryLRU(memory_budget)
+        self.disk = DiskLRU(disk_directory, disk_budget)
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+        # One thread, so that stores don't compete with each other, or
+        # with the page load, for more than one core's worth of time.
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dom-cache")
+
+    def lookup(
+        self,
+        key: str,
+        preload_scanner: Optional[PreloadScanner] = None
+    ) -> Optional[Tuple[HTMLNode, DOMIndex]]:
+        # Keys are already hex digests, so they make safe file names.
+        with self.lock:
+            data = self.memory.get(key)
+            if data is None:
+                data = self.disk.read(key)
+                if data is not None:
+                    self.memory.put(key, data)
+
+            if data is None:
+                self.misses += 1
+                return None
+
+        try:
+            tree = deserialize_tree(data, preload_scanner)
+        except (EOFError, ValueError, TypeError, zlib.error):
+            # A damaged entry is as good as a missing one.
+            self.remove(key)
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits += 1
+        return tree
+
+    def store(self, key: str, tree: HTMLNode) -> Future:
+        '''
+            Stores a tree in the background. The returned future is done once
+            the tree has been read, after which it is free to change again.
+            Serializing and writing it carry on after that.
+        '''
+        snapshot: Future = Future()
+        self.executor.submit(self.store_in_background, key, tree, snapshot)
+        return snapshot
+
+    def store_in_background(self, key: str, tree: HTMLNode, snapshot: Future) -> None:
+        try:
+            records = tree_records(tree)
+        finally:
+            # Whatever happened, the tab mustn't wait on the tree forever.
+            snapshot.set_result(None)
+
+        data = serialize_records(records)
+        with self.lock:
+            self.memory.put(key, data)
+            self.disk.write(key, data)
+
+    def remove(self, key: str) -> None:
+        with self.lock:
+            self.memory.pop(key)
+            self.disk.remove(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory.size,
+            }
+
+# Parsed trees are shared by every tab in the process.
+DOM_CACHE = DOMCache()
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional
+
+from hypertext.nodes import Element, HTMLNode
+from traversal import pre_order
+
+class DOMIndex:
+    '''
+        Finds elements by tag, by id, or by the attributes they carry,
+        without walking the whole document. The parser adds elements as it
+        creates them, and anything that later changes the tree must keep
+        the index up to date through add_subtree(), remove_subtree() and
+        set_attribute().
+
+        Lookups return elements in document order. Elements are usually
+        added in document order, so this is free; after a subtree has been
+        inserted into the middle of the document, the order is recomputed
+        once, on the next lookup.
+    '''
+
+    def __init__(self) -> None:
+        self.root: Optional[HTMLNode] = None
+
+        # Dicts, rather than lists, so that elements can be removed in
+        # constant time. The values are unused.
+        self.by_tag: Dict[str, Dict[Element, None]] = {}
+        self.by_attribute: Dict[str, Dict[Element, None]] = {}
+        self.by_id: Dict[str, Element] = {}
+
+        # Position of every node in the document, when elements have been
+        # added out of document order.
+        self.in_order = True
+        self.order: Optional[Dict[HTMLNode, int]] = None
+
+    def add(self, element: Element) -> None:
+        self.by_tag.setdefault(element.tag, {})[element] = None
+        for name in element.attributes:
+            self.by_attribute.setdefault(name, {})[element] = None
+        if "id" in element.attributes:
+            self.by_id.setdefault(element.attributes["id"], element)
+
+    def remove(self, element: Element) -> None:
+        self.by_tag.get(element.tag, {}).pop(element, None)
+        for name in element.attributes:
+            self.by_attribute.get(name, {}).pop(element, None)
+        if self.by_id.get(element.attributes.get("id")) is element:
+            del self.by_id[element.attributes["id"]]
+
+    def add_subtree(self, node: HTMLNode) -> None:
+        '''
+            Indexes a subtree that has been inserted into the document.
+        '''
+        for descendant in pre_order(node):
+            if isinstance(descendant, Element):
+                self.add(descendant)
+        self.in_order = False
+        self.order = None
+
+    def remove_subtree(self, node: HTMLNode) -> None:
+        for descendant in pre_order(node):
+            if isinstance(descendant, Element):
+                self.remove(descendant)
+
+    def set_attribute(self, element: Element, name: str, value: str) -> None:
+        # The element keeps its place in by_tag, and in by_attribute unless
+        # the attribute is new, so that lookups stay in document order.
+        is_new = name not in element.attributes
+        if name == "id" and self.by_id.get(element.attributes.get("id")) is element:
+            del self.by_id[element.attributes["id"]]
+
+        element.set_attribute(name, value)
+
+        if is_new:
+            self.by_attribute.setdefault(name, {})[element] = None
+            self.in_order = False
+            self.order = None
+        if name == "id":
+            self.by_id.setdefault(value, element)
+
+    def elements_with_tag(self, tag: str) -> List[Element]:
+        return self.in_document_order(self.by_tag.get(tag, {}))
+
+    def elements_with_attribute(self, name: str) -> List[Element]:
+        return self.in_document_order(self.by_attribute.get(name, {}))
+
+    def element_by_id(self, id: str) -> Optional[Element]:
+        return self.by_id.get(id)
+
+    def in_document_order(self, elements: Iterable[Element]) -> List[Element]:
+        if self.in_order:
+            return list(elements)
+
+        if self.order is None:
+            self.order = {node: i for i, node in enumerate(pre_order(self.root))}
+        return sorted(elements, key=self.order.__getitem__)
+
+def is_descendant(node: HTMLNode, ancestor: HTMLNode) -> bool:
+    while node is not None:
+        if node is ancestor: return True
+        node = node.parent
+    return False
@@ -1,26 +1,73 @@
 from __future__ import annotations
 
-from typing import List
+import sys
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Sequence
+
+# Most nodes have no children, and most elements have no attributes, so
+# they all share these immutable empty values instead of allocating their
+# own. A node gets a real list or dict the first time one is added.
+NO_CHILDREN: Sequence[HTMLNode] = ()
+NO_ATTRIBUTES: Mapping[str, str] = MappingProxyType({})
 
 class HTMLNode:
+    # Slots keep nodes free of a per-instance __dict__.
+    __slots__ = ("parent", "children", "is_focused", "style", "child_needs_style")
+
     def __init__(self, parent: HTMLNode) -> None:
         self.parent = parent
-        self.children: List[HTMLNode] = []
+        self.children: Sequence[HTMLNode] = NO_CHILDREN
         self.is_focused = False
 
+        # Computed by the style computer. A node without a style needs it,
+        # and the styles of its descendants, computed again.
+        self.style: Optional[Dict[str, str]] = None
+
+        # Whether some descendant needs its style computed again, so that
+        # a restyle can skip every subtree without one.
+        self.child_needs_style = False
+
+    def add_child(self, node: HTMLNode) -> None:
+        if self.children is NO_CHILDREN:
+            self.children = []
+        self.children.append(node)
+
+    def invalidate_style(self) -> None:
+        '''
+            Marks the node, and so its descendants, as needing their styles
+            computed again, after something they depend on has changed.
+        '''
+        self.style = None
+        node = self.parent
+        while node is not None and not node.child_needs_style:
+            node.child_needs_style = True
+            node = node.parent
+
 class Element(HTMLNode):
-    def __init__(self, tag: str, attributes, parent: HTMLNode):
+    __slots__ = ("tag", "attributes")
+
+    def __init__(self, tag: str, attributes: Mapping[str, str], parent: HTMLNode):
         super().__init__(parent)
-        self.tag = tag
-        self.attributes = attributes
+        # Tag names repeat thousands of times in a document, so every
+        # element shares one copy of each name.
+        self.tag = sys.intern(tag)
+        self.attributes = attributes if attributes else NO_ATTRIBUTES
+
+    def set_attribute(self, name: str, value: str) -> None:
+        if self.attributes is NO_ATTRIBUTES:
+            self.attributes = {}
+        self.attributes[name] = value
+        self.invalidate_style()
 
     def __repr__(self) -> str:
         return "<" + self.tag + ">"
-    
+
 class Text(HTMLNode):
+    __slots__ = ("text",)
+
     def __init__(self, text, parent: HTMLNode):
         super().__init__(parent)
         self.text = text
 
     def __repr__(self) -> str:
-        return repr(self.text)
\ No newline at end of file
+        return repr(self.text)
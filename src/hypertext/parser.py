@@ -1,5 +1,13 @@
-from hypertext.nodes import Element, Text, HTMLNode
-from typing import List, Dict, Tuple
+from __future__ import annotations
+
+import sys
+
+from hypertext.index import DOMIndex
+from hypertext.nodes import NO_ATTRIBUTES, Element, Text, HTMLNode
+from typing import TYPE_CHECKING, List, Mapping, Optional, Tuple
+
+if TYPE_CHECKING:
+    from hypertext.preload_scanner import PreloadScanner
 
 class HTMLParser:
 
@@ -13,26 +21,74 @@ class HTMLParser:
         "link", "meta", "title", "style", "script",
     ]
 
-    def __init__(self, body: str) -> None:
+    def __init__(self, body: str = "", preload_scanner: Optional[PreloadScanner] = None) -> None:
         self.body = body
         self.unfinished: List[HTMLNode] = []
+        self.preload_scanner = preload_scanner
+
+        # Every element, by tag, id and attribute, added as it is created.
+        self.index = DOMIndex()
+
+        # Text after the last "<" or ">" fed so far, and whether it is
+        # inside a tag. It can't be handled until the next "<" or ">" shows
+        # where it ends, which may only arrive with the next chunk. It is
+        # kept in pieces, so that a long run of text arriving in many chunks
+        # is only joined once.
+        self.pending: List[str] = []
+        self.in_tag = False
 
     def parse(self) -> HTMLNode:
+        self.feed(self.body)
+        return self.close()
+
+    def feed(self, chunk: str) -> None:
+        '''
+            Parses the next chunk of the document. Chunks may split a tag or
+            a run of text anywhere. Between calls, the partially built tree
+            can be inspected through self.unfinished.
+        '''
+
+        self.pending.append(chunk)
+
+        # Nothing ends until a "<" or ">" arrives.
+        if "<" not in chunk and ">" not in chunk: return
+
+        # Rather than looking at one character at a time, split the text at
+        # every "<", and then each piece at every ">", slicing whole tags
+        # and runs of text out at once. Each "<" ends a run of text, and
+        # each ">" ends a tag.
+        segments = "".join(self.pending).split("<")
+        last = len(segments) - 1
+        in_tag = self.in_tag
         text = ""
-        in_tag = False
-        for c in self.body:
-            if c == "<":
-                in_tag = True
-                if text: self.add_text(text)
-                text = ""
-            elif c == ">":
+        for i, segment in enumerate(segments):
+            # Everything after a "<" is inside a tag until a ">".
+            if i > 0: in_tag = True
+
+            if ">" in segment:
+                *tags, text = segment.split(">")
+                for tag in tags:
+                    self.add_tag(tag)
                 in_tag = False
-                self.add_tag(text)
-                text = ""
             else:
-                text += c
-        if not in_tag and text:
+                text = segment
+
+            # The text is followed by a "<", unless it's the last segment.
+            if text and i < last:
+                self.add_text(text)
+
+        self.pending = [text]
+        self.in_tag = in_tag
+
+    def close(self) -> HTMLNode:
+        '''
+            Finishes parsing after the last chunk has been fed, and returns
+            the root of the tree. An unclosed tag at the end is dropped.
+        '''
+        text = "".join(self.pending)
+        if not self.in_tag and text:
             self.add_text(text)
+        self.pending = []
         return self.finish()
     
     def add_text(self, text: str) -> None:
@@ -45,7 +101,7 @@ class HTMLParser:
 
         parent = self.unfinished[-1]
         node = Text(text, parent)
-        parent.children.append(node)
+        parent.add_child(node)
 
     def add_tag(self, tag: str) -> None:
 
@@ -54,6 +110,11 @@ class HTMLParser:
         # Discard the doctype.
         if tag.startswith("!"): return
 
+        # Start downloading subresources while the rest of the document
+        # is still being parsed.
+        if self.preload_scanner:
+            self.preload_scanner.scan(tag, attributes)
+
         self.implicit_tags(tag)
 
         if tag.startswith("/"):
@@ -65,18 +126,20 @@ class HTMLParser:
             # the previous unfinished node in the list.
             node = self.unfinished.pop()
             parent = self.unfinished[-1]
-            parent.children.append(node)
+            parent.add_child(node)
         elif tag in self.SELF_CLOSING_TAGS:
             # Auto-close a self-closing tag.
             parent = self.unfinished[-1]
             node = Element(tag, attributes, parent)
-            parent.children.append(node)
+            parent.add_child(node)
+            self.index.add(node)
         else:
             # Opening tag.
             # Add an unfinished node to the end of the list.
             parent = self.unfinished[-1] if self.unfinished else None
             node = Element(tag, attributes, parent)
             self.unfinished.append(node)
+            self.index.add(node)
 
     def finish(self) -> HTMLNode:
         if not self.unfinished:
@@ -85,10 +148,14 @@ class HTMLParser:
         while len(self.unfinished) > 1:
             node = self.unfinished.pop()
             parent = self.unfinished[-1]
-            parent.children.append(node)
+            parent.add_child(node)
+        self.index.root = self.unfinished[-1]
         return self.unfinished.pop()
     
     def implicit_tags(self, tag: str) -> None:
+        # Implicit tags are only ever needed near the top of the document.
+        if len(self.unfinished) > 2: return
+
         while True:
             open_tags = [node.tag for node in self.unfinished]
 
@@ -109,9 +176,13 @@ class HTMLParser:
             else:
                 break
     
-    def get_attributes(self, text: str) -> Tuple[str, Dict[str, str]]:
+    def get_attributes(self, text: str) -> Tuple[str, Mapping[str, str]]:
         parts = text.split()
         tag = parts[0].casefold()
+
+        # Most tags don't have any attributes.
+        if len(parts) == 1: return tag, NO_ATTRIBUTES
+
         attributes = {}
         for attrpair in parts[1:]:
             if "=" in attrpair:
@@ -122,8 +193,8 @@ class HTMLParser:
                 if len(value) > 2 and value[0] in ["'", "\""]:
                     value = value[1:-1]
 
-                attributes[key.casefold()] = value
+                attributes[sys.intern(key.casefold())] = value
             else:
                 # Attribute value is omitted.
-                attributes[attrpair.casefold()] = ""
+                attributes[sys.intern(attrpair.casefold())] = ""
         return tag, attributes
\ No newline at end of file
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from url.fetch_scheduler import SCHEDULER
+from url.url import Url
+
+if TYPE_CHECKING:
+    from chrome.navigation_timing import NavigationTiming
+
+class PreloadScanner:
+    '''
+        Watches the tags the HTML parser produces, and starts downloading
+        linked stylesheets and scripts as soon as their tags are seen, rather
+        than after the whole document has been parsed. The downloads are
+        kept in document order, for the style and script stages to consume
+        once parsing is done.
+    '''
+
+    def __init__(self, base_url: Url, timing: Optional[NavigationTiming] = None) -> None:
+        self.base_url = base_url
+        self.timing = timing
+        self.fetches: Dict[str, Future] = {}
+        self.stylesheet_urls: List[Url] = []
+        self.stylesheet_fetches: List[Future] = []
+        self.script_urls: List[Url] = []
+        self.script_fetches: List[Future] = []
+
+    def scan(self, tag: str, attributes: Dict[str, str]) -> None:
+        if tag == "link" \
+            and attributes.get("rel") == "stylesheet" \
+            and "href" in attributes:
+            self.stylesheet_urls.append(self.base_url.resolve(attributes["href"]))
+            self.stylesheet_fetches.append(self.preload(attributes["href"]))
+        elif tag == "script" and "src" in attributes:
+            self.script_urls.append(self.base_url.resolve(attributes["src"]))
+            self.script_fetches.append(self.preload(attributes["src"]))
+
+    def preload(self, link: str) -> Future:
+        url = self.base_url.resolve(link)
+        key = str(url)
+
+        # A resource linked more than once is only downloaded once.
+        if key not in self.fetches:
+            timing = self.timing.resource(url) if self.timing else None
+            self.fetches[key] = SCHEDULER.fetch(url, timing)
+
+        return self.fetches[key]
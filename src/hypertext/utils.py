@@ -1,4 +1,5 @@
 from hypertext.nodes import HTMLNode
+from traversal import pre_order
 from typing import List
 
 def log_tree(node: HTMLNode, indent = 0) -> None:
@@ -7,7 +8,5 @@ def log_tree(node: HTMLNode, indent = 0) -> None:
         log_tree(child, indent + 4)
 
 def tree_to_list(tree: HTMLNode, list: List[HTMLNode]) -> List[HTMLNode]:
-    list.append(tree)
-    for child in tree.children:
-        tree_to_list(child, list)
+    list.extend(pre_order(tree))
     return list
\ No newline at end of file
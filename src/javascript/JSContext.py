@@ -2,8 +2,9 @@ import dukpy
 import os
 
 from css.parser import CSSParser
-from hypertext.utils import tree_to_list
+from hypertext.nodes import Element
 from hypertext.parser import HTMLParser
+from traversal import pre_order
 
 class JSContext:
 
@@ -43,10 +44,19 @@ class JSContext:
     def querySelectorAll(self, selector_text: str) -> None:
         selector = CSSParser(selector_text).selector()
 
+        # Only elements with the tag on the right of the selector can
+        # match, so only those need to be checked.
+        tag = selector.rightmost_tag
+        if tag is None:
+            candidates = (node for node in pre_order(self.tab.nodes) if isinstance(node, Element))
+        else:
+            candidates = self.tab.index.elements_with_tag(tag)
+
+        matches = selector.compile()
         nodes = [
             node for node
-            in tree_to_list(self.tab.nodes, [])
-            if selector.matches(node)]
+            in candidates
+            if matches(node)]
         
         return [
             self.get_handle(node) for node in nodes
@@ -73,11 +83,15 @@ class JSContext:
 
         # Set the new top-level node of the element.
         elt = self.handle_to_node[handle]
+        for child in elt.children:
+            self.tab.index.remove_subtree(child)
         elt.children = new_nodes
 
         # Update parent pointers of children to point to
         # the child of the body.
         for child in elt.children:
             child.parent = elt
+            child.invalidate_style()
+            self.tab.index.add_subtree(child)
 
         self.tab.render()
\ No newline at end of file
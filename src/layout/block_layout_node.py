@@ -38,9 +38,9 @@ class BlockLayoutNode(LayoutNode):
 
         if isinstance(self.node, Element) and self.node.tag == "pre":
 
-            bgcolor = self.node.style.get("background-color", "transparent")
+            bgcolor = self.node.style.background_color
 
-            if bgcolor != "transparent":
+            if bgcolor:
                 x2, y2 = self.x + self.width, self.y + self.height
                 rect = DrawRect(Rect(self.x, self.y, x2, y2), bgcolor)
                 commands.append(rect)
@@ -128,19 +128,7 @@ class BlockLayoutNode(LayoutNode):
                     self.recurse(child)
 
     def word(self, node: Text, word: str) -> None:
-        weight = node.style["font-weight"]
-        style = node.style["font-style"]
-
-        # Translate CSS "normal" to Tk "roman".
-        if style == "normal": style = "roman"
-
-        # Translate CSS "900" to Tk "bold".
-        if weight == "900": weight = "bold"
-
-        # Convert CSS pixels to Tk points.
-        size = int(float(node.style["font-size"][:-2]) * 0.75)
-
-        font = self.get_font(size, weight, style)
+        font = self.get_font(*node.style.font_key)
         w = font.measure(word)
 
         if self.cursor_x + w > self.width:
@@ -158,19 +146,7 @@ class BlockLayoutNode(LayoutNode):
     def input(self, node: Text) -> None:
         w = INPUT_WIDTH_PX
 
-        weight = node.style["font-weight"]
-        style = node.style["font-style"]
-
-        # Translate CSS "normal" to Tk "roman".
-        if style == "normal": style = "roman"
-
-        # Translate CSS "900" to Tk "bold".
-        if weight == "900": weight = "bold"
-
-        # Convert CSS pixels to Tk points.
-        size = int(float(node.style["font-size"][:-2]) * 0.75)
-
-        font = self.get_font(size, weight, style)
+        font = self.get_font(*node.style.font_key)
 
         if self.cursor_x + w > self.width:
             # Wrap text to next line.
@@ -17,19 +17,7 @@ class InputLayoutNode(LayoutNode):
         self.width = INPUT_WIDTH_PX
 
     def layout(self) -> None:
-        weight = self.node.style["font-weight"]
-        style = self.node.style["font-style"]
-
-        # Translate CSS "normal" to Tk "roman".
-        if style == "normal": style = "roman"
-
-        # Translate CSS "900" to Tk "bold".
-        if weight == "900": weight = "bold"
-
-        # Convert CSS pixels to Tk points.
-        size = int(float(self.node.style["font-size"][:-2]) * 0.75)
-
-        self.font = self.get_font(size, weight, style)
+        self.font = self.get_font(*self.node.style.font_key)
 
         # If there is a previous sibling, then layout starts right after
         # that sibling. Otherwise, layout starts at the parent's top edge.
@@ -46,9 +34,9 @@ class InputLayoutNode(LayoutNode):
 
     def paint(self) -> list:
         commands = []
-        bgcolor = self.node.style.get("background-color", "transparent")
+        bgcolor = self.node.style.background_color
 
-        if bgcolor != "transparent":
+        if bgcolor:
             x2, y2 = self.x + self.width, self.y + self.height
             rect = DrawRect(Rect(self.x, self.y, x2, y2), bgcolor)
             commands.append(rect)
@@ -67,7 +55,7 @@ class InputLayoutNode(LayoutNode):
             cx = self.x + self.font.measure(text)
             commands.append(DrawLine(Rect(cx, self.y, cx, self.y + self.height), "black", 1))
 
-        color = self.node.style["color"]
+        color = self.node.style.color
         commands.append(DrawText(Rect(self.x, self.y), text, self.font, color))
 
         return commands
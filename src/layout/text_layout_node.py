@@ -16,19 +16,7 @@ class TextLayoutNode(LayoutNode):
         self.word = word
 
     def layout(self) -> None:
-        weight = self.node.style["font-weight"]
-        style = self.node.style["font-style"]
-
-        # Translate CSS "normal" to Tk "roman".
-        if style == "normal": style = "roman"
-
-        # Translate CSS "900" to Tk "bold".
-        if weight == "900": weight = "bold"
-
-        # Convert CSS pixels to Tk points.
-        size = int(float(self.node.style["font-size"][:-2]) * 0.75)
-
-        self.font = self.get_font(size, weight, style)
+        self.font = self.get_font(*self.node.style.font_key)
 
         self.width = self.font.measure(self.word)
 
@@ -46,7 +34,7 @@ class TextLayoutNode(LayoutNode):
         return True
 
     def paint(self) -> list:
-        color = self.node.style["color"]
+        color = self.node.style.color
         return [DrawText(Rect(self.x, self.y), self.word, self.font, color)]
 
     def get_font(self, size: int, weight: str, style: str) -> Tuple[Font, Label]:
@@ -1,11 +1,10 @@
 from typing import List
 
 from layout.layout_node import LayoutNode
+from traversal import pre_order
 
 def tree_to_list(tree: LayoutNode, list: List[LayoutNode]) -> List[LayoutNode]:
-    list.append(tree)
-    for child in tree.children:
-        tree_to_list(child, list)
+    list.extend(pre_order(tree))
     return list
 
 def log_tree(node: LayoutNode, indent = 0) -> None:
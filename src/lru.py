@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Iterator, Optional, TypeVar
+
+V = TypeVar("V")
+
+class MemoryLRU(Generic[V]):
+    '''
+        Values kept in memory up to a budget, measured by the size function.
+        When the budget is exceeded, the least recently used values are
+        evicted first. Callers are responsible for locking.
+    '''
+
+    def __init__(self, budget: int, size: Callable[[V], int] = len) -> None:
+        self.budget = budget
+        self.size_of = size
+        self.values: OrderedDict[Hashable, V] = OrderedDict()
+        self.size = 0
+
+    def get(self, key: Hashable) -> Optional[V]:
+        value = self.values.get(key)
+        if value is not None:
+            self.values.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: V) -> None:
+        self.pop(key)
+
+        # Don't let a single huge value flush out everything else.
+        if self.size_of(value) > self.budget: return
+
+        self.values[key] = value
+        self.size += self.size_of(value)
+
+        while self.size > self.budget:
+            _, evicted = self.values.popitem(last=False)
+            self.size -= self.size_of(evicted)
+
+    def pop(self, key: Hashable) -> Optional[V]:
+        value = self.values.pop(key, None)
+        if value is not None:
+            self.size -= self.size_of(value)
+        return value
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.values)
+
+class DiskLRU:
+    '''
+        Files in a directory, up to a budget of bytes. When the budget is
+        exceeded, the least recently used files are deleted first. Reading
+        a file updates its modification time, so that the order survives a
+        restart. A directory of None keeps nothing. Callers are responsible
+        for locking, and for choosing names that are safe as file names.
+    '''
+
+    def __init__(self, directory: Optional[str], budget: int) -> None:
+        self.directory = directory
+        self.budget = budget
+        self.sizes: Optional[OrderedDict[str, int]] = None
+        self.size = 0
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def load_index(self) -> OrderedDict[str, int]:
+        '''
+            Lists the files already on disk, from least to most recently
+            used, the first time the disk is needed.
+        '''
+        if self.sizes is None:
+            self.sizes = OrderedDict()
+            try:
+                files = sorted(os.scandir(self.directory),
+                    key=lambda f: f.stat().st_mtime)
+                for file in files:
+                    self.sizes[file.name] = file.stat().st_size
+                    self.size += file.stat().st_size
+            except OSError:
+                pass
+        return self.sizes
+
+    def read(self, name: str) -> Optional[bytes]:
+        if self.directory is None: return None
+
+        path = self.path(name)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)
+        except OSError:
+            return None
+
+        sizes = self.load_index()
+        if name in sizes:
+            sizes.move_to_end(name)
+        return data
+
+    def write(self, name: str, *parts: bytes) -> None:
+        if self.directory is None: return
+
+        # Don't let a single huge file flush out everything else. Whatever
+        # was stored under the name before is out of date, though.
+        size = sum(len(part) for part in parts)
+        if size > self.budget:
+            self.remove(name)
+            return
+
+        path = self.path(name)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+
+            # Write to a temporary file first, so that a crash can't leave
+            # a half-written file behind.
+            with open(path + ".tmp", "wb") as file:
+                for part in parts:
+                    file.write(part)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            return
+
+        sizes = self.load_index()
+        self.size -= sizes.pop(name, 0)
+        sizes[name] = size
+        self.size += size
+
+        while self.size > self.budget:
+            evicted, size = sizes.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(self.path(evicted))
+            except OSError:
+                pass
+
+    def remove(self, name: str) -> None:
+        if self.directory is None: return
+
+        self.size -= self.load_index().pop(name, 0)
+        try:
+            os.remove(self.path(name))
+        except OSError:
+            pass
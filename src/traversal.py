@@ -0,0 +1,41 @@
+from typing import Iterator, Protocol, Sequence, TypeVar
+
+class TreeNode(Protocol):
+    children: Sequence
+
+Node = TypeVar("Node", bound=TreeNode)
+
+# Both generators keep their own stack, holding one iterator over the
+# children of each node on the current path, so that a deeply nested tree
+# can't overflow Python's call stack. Nodes are yielded as they are reached,
+# without first copying the tree into a list.
+
+def pre_order(root: Node) -> Iterator[Node]:
+    '''
+        Yields every node of a tree, each one before its children, in
+        document order.
+    '''
+    yield root
+    stack = [iter(root.children)]
+    while stack:
+        for child in stack[-1]:
+            yield child
+            if child.children:
+                stack.append(iter(child.children))
+                break
+        else:
+            stack.pop()
+
+def post_order(root: Node) -> Iterator[Node]:
+    '''
+        Yields every node of a tree, each one after its children.
+    '''
+    stack = [(root, iter(root.children))]
+    while stack:
+        node, children = stack[-1]
+        for child in children:
+            stack.append((child, iter(child.children)))
+            break
+        else:
+            stack.pop()
+            yield node
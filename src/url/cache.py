@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from lru import DiskLRU, MemoryLRU
+
+ResponseHeaders = Dict[str, str]
+
+# Headers that describe how a body was sent rather than the body itself.
+# Stored bodies are already decoded, so these no longer apply to them.
+UNSTORED_HEADERS = [
+    "connection", "keep-alive", "transfer-encoding",
+    "content-encoding", "content-length", "age",
+]
+
+def storable_headers(headers: ResponseHeaders) -> ResponseHeaders:
+    return {k: v for k, v in headers.items() if k not in UNSTORED_HEADERS}
+
+def response_time(headers: ResponseHeaders) -> float:
+    '''
+        Returns when the response was generated by the origin server. The
+        Age header says how long the response already sat in other caches.
+    '''
+    try:
+        age = max(0, int(headers.get("age", "0")))
+    except ValueError:
+        age = 0
+    return time.time() - age
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    '''
+        Parses a Cache-Control header into a dictionary of directives.
+        Directives without an argument, like no-store, map to None.
+    '''
+    directives = {}
+    for part in value.split(","):
+        part = part.strip()
+        if not part: continue
+        if "=" in part:
+            name, arg = part.split("=", 1)
+            directives[name.strip().casefold()] = arg.strip().strip('"')
+        else:
+            directives[part.casefold()] = None
+    return directives
+
+def parse_http_date(value: Optional[str]) -> Optional[float]:
+    if not value: return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def disk_name(url: str) -> str:
+    # URLs can't be used as file names, but their hashes can.
+    return hashlib.sha256(url.encode("utf8")).hexdigest()
+
+class CacheEntry:
+    '''
+        A stored response. An entry is fresh for freshness_lifetime seconds
+        after the response was generated, and after that must be revalidated
+        with the server before it is used again.
+    '''
+
+    def __init__(self, headers: ResponseHeaders, body: bytes, response_time: float) -> None:
+        self.headers = headers
+        self.body = body
+        self.response_time = response_time
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+    @property
+    def freshness_lifetime(self) -> float:
+        directives = parse_cache_control(self.headers.get("cache-control", ""))
+
+        if "no-cache" in directives:
+            return 0
+
+        if "max-age" in directives:
+            try:
+                return max(0, int(directives["max-age"]))
+            except ValueError:
+                return 0
+
+        date = parse_http_date(self.headers.get("date")) or self.response_time
+        expires = parse_http_date(self.headers.get("expires"))
+        if expires is not None:
+            return max(0, expires - date)
+
+        # Heuristic freshness: a resource that hasn't changed in a long time
+        # probably won't change soon. Use 10% of the time since it was last
+        # modified, as suggested by RFC 9111.
+        last_modified = parse_http_date(self.headers.get("last-modified"))
+        if last_modified is not None:
+            return max(0, (date - last_modified) / 10)
+
+        return 0
+
+    @property
+    def current_age(self) -> float:
+        return time.time() - self.response_time
+
+    def is_fresh(self) -> bool:
+        return self.current_age < self.freshness_lifetime
+
+    def validators(self) -> Dict[str, str]:
+        '''
+            Returns the request headers for a conditional request that asks
+            the server to respond with 304 Not Modified if this entry is
+            still current.
+        '''
+        headers = {}
+        if "etag" in self.headers:
+            headers["If-None-Match"] = self.headers["etag"]
+        if "last-modified" in self.headers:
+            headers["If-Modified-Since"] = self.headers["last-modified"]
+        return headers
+
+    def is_storable(self) -> bool:
+        directives = parse_cache_control(self.headers.get("cache-control", ""))
+        if "no-store" in directives:
+            return False
+
+        # Only keep responses that can either be used without contacting
+        # the server, or cheaply revalidated with it.
+        return self.freshness_lifetime > 0 or bool(self.validators())
+
+class HttpCache:
+    '''
+        A two-tier cache of GET responses, keyed by URL. Recently used
+        entries are kept in memory, up to MEMORY_BUDGET bytes of bodies, and
+        every entry is also written to disk, up to DISK_BUDGET bytes, so
+        that it survives a restart. When a budget is exceeded, the least
+        recently used entries are evicted first.
+
+        The hits, misses and revalidations counters record how each lookup
+        was satisfied: from the cache, from the network, or from the cache
+        after the server confirmed the entry was still current.
+    '''
+
+    MEMORY_BUDGET = 16 * 1024 * 1024
+    DISK_BUDGET = 128 * 1024 * 1024
+    DISK_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "monarch-browser", "http")
+
+    def __init__(
+        self,
+        memory_budget: int = MEMORY_BUDGET,
+        disk_budget: int = DISK_BUDGET,
+        disk_directory: Optional[str] = DISK_DIRECTORY
+    ) -> None:
+        self.memory: MemoryLRU[CacheEntry] = MemoryLRU(memory_budget, lambda entry: entry.size)
+        self.disk = DiskLRU(disk_directory, disk_budget)
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        with self.lock:
+            entry = self.memory.get(url)
+            if entry: return entry
+
+            entry = self.read_from_disk(url)
+            if entry:
+                self.memory.put(url, entry)
+            return entry
+
+    def store(self, url: str, headers: ResponseHeaders, body: bytes) -> None:
+        entry = CacheEntry(storable_headers(headers), body, response_time(headers))
+        with self.lock:
+            if not entry.is_storable():
+                self.remove(url)
+                return
+            self.memory.put(url, entry)
+            self.write_to_disk(url, entry)
+
+    def is_storable(self, headers: ResponseHeaders) -> bool:
+        '''
+            Decides from the response headers alone, before the body has been
+            read, whether a response should be stored.
+        '''
+        return CacheEntry(storable_headers(headers), b"", time.time()).is_storable()
+
+    def revalidate(self, url: str, entry: CacheEntry, headers: ResponseHeaders) -> None:
+        '''
+            Updates an entry after the server responded 304 Not Modified. The
+            304 response carries fresh caching headers but no body.
+        '''
+        entry.headers = {**entry.headers, **storable_headers(headers)}
+        entry.response_time = response_time(headers)
+        with self.lock:
+            self.revalidations += 1
+            self.memory.put(url, entry)
+            self.write_to_disk(url, entry)
+
+    def remove(self, url: str) -> None:
+        with self.lock:
+            self.memory.pop(url)
+            self.disk.remove(disk_name(url))
+
+    def record_hit(self) -> None:
+        with self.lock:
+            self.hits += 1
+
+    def record_miss(self) -> None:
+        with self.lock:
+            self.misses += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "memory_entries": len(self.memory),
+                "memory_bytes": self.memory.size,
+            }
+
+    def read_from_disk(self, url: str) -> Optional[CacheEntry]:
+        data = self.disk.read(disk_name(url))
+        if data is None: return None
+
+        # The first line holds the metadata, and the rest is the body.
+        try:
+            line, body = data.split(b"\n", 1)
+            metadata = json.loads(line)
+        except ValueError:
+            return None
+
+        # Two URLs could in theory hash to the same file.
+        if metadata["url"] != url: return None
+
+        return CacheEntry(metadata["headers"], body, metadata["response_time"])
+
+    def write_to_disk(self, url: str, entry: CacheEntry) -> None:
+        metadata = json.dumps({
+            "url": url,
+            "headers": entry.headers,
+            "response_time": entry.response_time,
+        }).encode("utf8")
+        self.disk.write(disk_name(url), metadata, b"\n", entry.body)
+
+# Responses are shared by every tab in the process.
+CACHE = HttpCache()
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import socket
+import ssl
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from url.resolver import RESOLVER
+from url.timing import ResourceTiming
+
+PoolKey = Tuple[str, str, int]
+
+class Connection:
+    '''
+        A socket to a web server along with the buffered reader used to
+        read responses from it. The reader must live as long as the socket,
+        because it may already hold bytes that belong to the next response.
+    '''
+
+    def __init__(self, key: PoolKey, sock: socket.socket) -> None:
+        self.key = key
+        self.sock = sock
+        self.file = sock.makefile("rb")
+        self.last_used = time.monotonic()
+        self.reused = False
+
+    def send(self, data: bytes) -> None:
+        self.sock.sendall(data)
+
+    def close(self) -> None:
+        try:
+            self.file.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+class ConnectionPool:
+    '''
+        Keeps HTTP/1.1 connections open after a response has been read, so
+        that later requests to the same (scheme, host, port) can skip the
+        TCP connect and TLS handshake. New connections share one SSL context
+        and resume the last TLS session with the same host when they can.
+
+        Idle connections are dropped after IDLE_TIMEOUT seconds, and at most
+        MAX_CONNECTIONS_PER_HOST connections (idle or in use) are kept open
+        to a single host. Callers that ask for more block until one of the
+        in-use connections is released.
+    '''
+
+    MAX_CONNECTIONS_PER_HOST = 6
+    IDLE_TIMEOUT = 15.0
+
+    def __init__(
+        self,
+        max_connections_per_host: int = MAX_CONNECTIONS_PER_HOST,
+        idle_timeout: float = IDLE_TIMEOUT
+    ) -> None:
+        self.max_connections_per_host = max_connections_per_host
+        self.idle_timeout = idle_timeout
+        self.idle: Dict[PoolKey, List[Connection]] = {}
+        self.in_use: Dict[PoolKey, int] = {}
+        self.condition = threading.Condition()
+        self.ssl_context: Optional[ssl.SSLContext] = None
+        self.tls_sessions: Dict[Tuple[str, int], ssl.SSLSession] = {}
+
+    def acquire(
+        self,
+        scheme: str,
+        host: str,
+        port: int,
+        reuse: bool = True,
+        timing: Optional[ResourceTiming] = None
+    ) -> Connection:
+        key = (scheme, host, port)
+
+        with self.condition:
+            while True:
+                conn = self.pop_idle(key) if reuse else None
+                if conn:
+                    conn.reused = True
+                    if timing: timing.reused_connection = True
+                    self.in_use[key] = self.in_use.get(key, 0) + 1
+                    return conn
+
+                open_count = self.in_use.get(key, 0) + len(self.idle.get(key, []))
+                if open_count < self.max_connections_per_host:
+                    # Reserve a slot before connecting, so that other threads
+                    # can't open more connections than allowed in the meantime.
+                    self.in_use[key] = self.in_use.get(key, 0) + 1
+                    break
+
+                # A fresh connection was asked for, but the host is at its
+                # limit. Make room by closing the oldest idle connection.
+                if not reuse and self.idle.get(key):
+                    self.idle[key].pop(0).close()
+                    continue
+
+                self.condition.wait()
+
+        try:
+            return Connection(key, self.connect(scheme, host, port, timing))
+        except Exception:
+            with self.condition:
+                self.in_use[key] -= 1
+                self.condition.notify()
+            raise
+
+    def release(self, conn: Connection, reusable: bool) -> None:
+        with self.condition:
+            self.in_use[conn.key] -= 1
+            self.remember_tls_session(conn)
+
+            if reusable:
+                conn.last_used = time.monotonic()
+                self.idle.setdefault(conn.key, []).append(conn)
+            else:
+                conn.close()
+
+            self.condition.notify()
+
+    def pop_idle(self, key: PoolKey) -> Optional[Connection]:
+        idle = self.idle.get(key, [])
+        now = time.monotonic()
+
+        # Most recently used connections are at the end of the list,
+        # and are the least likely to have been closed by the server.
+        while idle:
+            conn = idle.pop()
+            if now - conn.last_used < self.idle_timeout:
+                return conn
+            conn.close()
+
+        return None
+
+    def connect(
+        self,
+        scheme: str,
+        host: str,
+        port: int,
+        timing: Optional[ResourceTiming] = None
+    ) -> socket.socket:
+        timing = timing or ResourceTiming(scheme + "://" + host)
+        error = None
+
+        timing.mark("dns_start")
+        addresses = RESOLVER.resolve(host, port)
+        timing.mark("dns_end")
+
+        # Try each address the host resolves to until one accepts.
+        for address in addresses:
+            s = socket.socket(
+                family=socket.AF_INET,
+                # We can send arbitrary amounts of data with a stream.
+                type=socket.SOCK_STREAM,
+                proto=socket.IPPROTO_TCP,
+            )
+
+            try:
+                timing.mark("connect_start")
+                s.connect(address)
+                timing.mark("connect_end")
+            except OSError as e:
+                s.close()
+                error = e
+                continue
+
+            if scheme == "https":
+                # Resume the last TLS session with this host, if there is one,
+                # to skip most of the handshake. Wrapping a connected socket
+                # performs the handshake right away.
+                timing.mark("tls_start")
+                try:
+                    s = self.get_ssl_context().wrap_socket(
+                        s,
+                        server_hostname=host,
+                        session=self.tls_sessions.get((host, port)))
+                except Exception:
+                    s.close()
+                    raise
+                timing.mark("tls_end")
+
+            return s
+
+        # The cached addresses may be out of date.
+        RESOLVER.forget(host, port)
+        raise error or OSError("Could not resolve " + host)
+
+    def get_ssl_context(self) -> ssl.SSLContext:
+        '''
+            Returns the context shared by all TLS connections. Creating one
+            loads the CA bundle from disk, so it is only done once.
+        '''
+        with self.condition:
+            if self.ssl_context is None:
+                self.ssl_context = ssl.create_default_context()
+            return self.ssl_context
+
+    def remember_tls_session(self, conn: Connection) -> None:
+        # TLS 1.3 servers send session tickets after the handshake, so the
+        # session is only known once some of the response has been read.
+        session = getattr(conn.sock, "session", None)
+        if session is not None:
+            _, host, port = conn.key
+            self.tls_sessions[(host, port)] = session
+
+    def close_all(self) -> None:
+        with self.condition:
+            for idle in self.idle.values():
+                for conn in idle:
+                    conn.close()
+            self.idle = {}
+
+# Connections are shared by every tab in the process.
+POOL = ConnectionPool()
@@ -0,0 +1,92 @@
+import zlib
+from typing import BinaryIO, Iterable, Iterator
+
+# How many bytes to read from the socket at a time.
+BLOCK_SIZE = 16 * 1024
+
+SUPPORTED_CONTENT_ENCODINGS = ["gzip", "deflate"]
+
+def read_length(file: BinaryIO, length: int) -> Iterator[bytes]:
+    '''
+        Yields a body framed by Content-Length. Raises if the connection
+        is closed before all of the body has arrived.
+    '''
+    remaining = length
+    while remaining > 0:
+        block = file.read(min(BLOCK_SIZE, remaining))
+        if not block:
+            raise ConnectionError("Connection closed before end of body")
+        remaining -= len(block)
+        yield block
+
+def read_until_close(file: BinaryIO) -> Iterator[bytes]:
+    '''
+        Yields a body that runs until the server closes the connection.
+    '''
+    while True:
+        block = file.read1(BLOCK_SIZE)
+        if not block: break
+        yield block
+
+def read_chunked(file: BinaryIO) -> Iterator[bytes]:
+    '''
+        Yields the data of a body sent with "Transfer-Encoding: chunked"
+        as each chunk arrives. Every chunk is a hexadecimal size line
+        followed by that many bytes and a CRLF. A chunk of size zero ends
+        the body, and is followed by optional trailers and a blank line.
+    '''
+    while True:
+        line = file.readline()
+        if not line:
+            raise ConnectionError("Connection closed before end of body")
+
+        # Ignore chunk extensions, which follow a semicolon.
+        size = int(line.split(b";", 1)[0].strip(), 16)
+        if size == 0: break
+
+        yield from read_length(file, size)
+
+        # Discard the CRLF that ends the chunk data.
+        file.readline()
+
+    # Discard trailers up to and including the blank line.
+    while True:
+        line = file.readline()
+        if line in [b"\r\n", b"\n", b""]: break
+
+def decode_content(blocks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    '''
+        Decompresses a body with the given Content-Encoding one block at
+        a time, so that the compressed body is never held in memory all
+        at once.
+    '''
+    encoding = encoding.strip().casefold()
+
+    if encoding in ["", "identity"]:
+        yield from blocks
+        return
+
+    if encoding == "gzip":
+        # Adding 16 to wbits makes zlib expect a gzip header and trailer.
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif encoding == "deflate":
+        decompressor = None
+    else:
+        raise ValueError("Unsupported content encoding: " + encoding)
+
+    for block in blocks:
+        if decompressor is None:
+            # "deflate" is supposed to be zlib-wrapped, but some servers
+            # send a raw deflate stream. The first two bytes tell them apart.
+            if len(block) >= 2 and (block[0] & 0x0f) == 8 \
+                and int.from_bytes(block[:2], "big") % 31 == 0:
+                decompressor = zlib.decompressobj(zlib.MAX_WBITS)
+            else:
+                decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+
+        data = decompressor.decompress(block)
+        if data: yield data
+
+    if decompressor is not None:
+        data = decompressor.flush()
+        if data: yield data
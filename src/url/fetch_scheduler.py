@@ -0,0 +1,50 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional
+
+from url.timing import ResourceTiming
+from url.url import Url
+
+class FetchScheduler:
+    '''
+        Downloads subresources, such as stylesheets and scripts, on a pool of
+        worker threads, so that a page with many of them waits about as long
+        as its slowest download rather than the sum of all of them.
+
+        Fetches start as soon as they are scheduled. Each returns a future,
+        and callers decide in which order to consume the results, so that
+        scripts still run and stylesheets still cascade in document order.
+    '''
+
+    MAX_CONCURRENT_FETCHES = 6
+
+    def __init__(self, max_concurrent_fetches: int = MAX_CONCURRENT_FETCHES) -> None:
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrent_fetches,
+            thread_name_prefix="fetch")
+
+    def fetch(self, url: Url, timing: Optional[ResourceTiming] = None) -> Future:
+        return self.executor.submit(url.request, None, timing)
+
+    def fetch_all(self, urls: List[Url]) -> List[Optional[str]]:
+        '''
+            Downloads all of the URLs at once, and returns their bodies in
+            the same order as the URLs. Failed downloads are None.
+        '''
+        return self.wait_all([self.fetch(url) for url in urls])
+
+    def wait_all(self, futures: List[Future]) -> List[Optional[str]]:
+        '''
+            Waits for fetches that have already been started, and returns
+            their bodies in the same order as the futures. Failed downloads
+            are None.
+        '''
+        bodies = []
+        for future in futures:
+            try:
+                bodies.append(future.result())
+            except Exception:
+                bodies.append(None)
+        return bodies
+
+# Fetch threads are shared by every tab in the process.
+SCHEDULER = FetchScheduler()
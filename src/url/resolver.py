@@ -0,0 +1,58 @@
+import socket
+import threading
+import time
+from typing import Dict, List, Tuple
+
+Address = Tuple[str, int]
+
+class Resolver:
+    '''
+        Caches host name lookups for the whole process, so that requests to
+        a host we've recently talked to don't wait on DNS again.
+
+        The system resolver doesn't tell us the TTL of the records it found,
+        so every answer is kept for a fixed TTL seconds. Failed lookups are
+        not cached.
+    '''
+
+    TTL = 60.0
+
+    def __init__(self, ttl: float = TTL) -> None:
+        self.ttl = ttl
+        self.entries: Dict[Tuple[str, int], Tuple[float, List[Address]]] = {}
+        self.lock = threading.Lock()
+
+    def resolve(self, host: str, port: int) -> List[Address]:
+        key = (host, port)
+        now = time.monotonic()
+
+        with self.lock:
+            if key in self.entries:
+                expires, addresses = self.entries[key]
+                if now < expires:
+                    return addresses
+                del self.entries[key]
+
+        # Don't hold the lock during the lookup, which may be slow.
+        infos = socket.getaddrinfo(
+            host, port,
+            family=socket.AF_INET,
+            type=socket.SOCK_STREAM,
+            proto=socket.IPPROTO_TCP)
+        addresses = [info[4] for info in infos]
+
+        with self.lock:
+            self.entries[key] = (now + self.ttl, addresses)
+
+        return addresses
+
+    def forget(self, host: str, port: int) -> None:
+        '''
+            Drops a cached answer, e.g. after none of its addresses could be
+            connected to.
+        '''
+        with self.lock:
+            self.entries.pop((host, port), None)
+
+# Lookups are shared by every tab in the process.
+RESOLVER = Resolver()
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import codecs
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+from url.timing import ResourceTiming
+
+# Hard-coding a default is not correct either, but UTF-8 is by far the
+# most common encoding when the server doesn't declare one.
+DEFAULT_CHARSET = "utf-8"
+
+def parse_charset(content_type: str) -> Optional[str]:
+    '''
+        Returns the charset parameter of a Content-Type header, such as
+        "text/html; charset=ISO-8859-1", if it names a known encoding.
+    '''
+    for param in content_type.split(";")[1:]:
+        if "=" not in param: continue
+        name, value = param.split("=", 1)
+        if name.strip().casefold() != "charset": continue
+        charset = value.strip().strip('"\'')
+        try:
+            return codecs.lookup(charset).name
+        except LookupError:
+            return None
+    return None
+
+class Response:
+    '''
+        A response whose body is read lazily. Iterating over a response
+        yields the body as raw byte blocks as they arrive, and iter_text()
+        yields it as text, decoded incrementally using the charset from the
+        Content-Type header. The body can only be consumed once.
+
+        When the body has been fully consumed, or the consumer stops early,
+        the release callback is called with whether the whole body was read,
+        so that the underlying connection can be reused or closed.
+
+        A buffered response is one whose whole body is already on hand, in
+        the HTTP cache or on disk, so reading it never waits on the network.
+        Its raw body can also be looked at with hash_body() before it is
+        consumed. A stored response is one whose body the HTTP cache keeps
+        once it has been read, so the next request for it will be buffered.
+    '''
+
+    def __init__(
+        self,
+        status: str,
+        headers: Dict[str, str],
+        blocks: Iterable[bytes],
+        release: Optional[Callable[[bool], None]] = None,
+        timing: Optional[ResourceTiming] = None,
+        buffered: bool = False,
+        stored: bool = False
+    ) -> None:
+        self.status = status
+        self.headers = headers
+        self.blocks = blocks
+        self.release = release
+        self.timing = timing
+        self.buffered = buffered
+        self.stored = stored
+        self.consumed = False
+
+    @property
+    def charset(self) -> str:
+        return parse_charset(self.headers.get("content-type", "")) or DEFAULT_CHARSET
+
+    def __iter__(self) -> Iterator[bytes]:
+        # Not a generator itself, so that the body is marked as consumed
+        # as soon as iteration is asked for, not on the first block.
+        if self.consumed:
+            raise RuntimeError("Response body has already been consumed")
+        self.consumed = True
+        return self.iter_blocks()
+
+    def iter_blocks(self) -> Iterator[bytes]:
+        try:
+            for block in self.blocks:
+                yield block
+        except BaseException:
+            # Includes GeneratorExit, when the consumer stops iterating early.
+            self.finish(complete=False)
+            raise
+
+        self.finish(complete=True)
+
+    def hash_body(self, digest) -> None:
+        '''
+            Feeds the raw body of a buffered response to a hash, one block at
+            a time, without consuming it.
+        '''
+        if not self.buffered:
+            raise RuntimeError("Only a buffered response can be read twice")
+        for block in self.blocks:
+            digest.update(block)
+
+    def hashing(self, digest) -> Response:
+        '''
+            Returns a response with the same body, which feeds each raw block
+            to a hash as it is read.
+        '''
+        def blocks() -> Iterator[bytes]:
+            for block in self:
+                digest.update(block)
+                yield block
+
+        return Response(self.status, self.headers, blocks(), timing=self.timing)
+
+    def iter_text(self) -> Iterator[str]:
+        # An incremental decoder holds on to a multi-byte character that is
+        # split across two blocks until the rest of it arrives.
+        decoder = codecs.getincrementaldecoder(self.charset)(errors="replace")
+        for block in self:
+            text = decoder.decode(block)
+            if text: yield text
+        text = decoder.decode(b"", final=True)
+        if text: yield text
+
+    def read(self) -> bytes:
+        return b"".join(self)
+
+    def text(self) -> str:
+        return "".join(self.iter_text())
+
+    def close(self) -> None:
+        '''
+            Discards the rest of the body without reading it. This also
+            releases the connection of a body that iteration was asked for
+            but never started on.
+        '''
+        self.consumed = True
+        self.finish(complete=False)
+
+    def finish(self, complete: bool) -> None:
+        if complete and self.timing:
+            self.timing.mark("body_complete")
+        if self.release:
+            release, self.release = self.release, None
+            release(complete)
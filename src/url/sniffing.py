@@ -0,0 +1,44 @@
+import codecs
+import re
+from typing import Optional
+
+# How far into a document to look for a <meta charset> declaration.
+# The HTML standard uses the same limit.
+PRESCAN_LENGTH = 1024
+
+BYTE_ORDER_MARKS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+# Matches both <meta charset="..."> and
+# <meta http-equiv="Content-Type" content="text/html; charset=...">.
+META_CHARSET = re.compile(
+    rb"<meta[^>]*?charset\s*=\s*[\"']?\s*([a-zA-Z0-9_:.-]+)",
+    re.IGNORECASE)
+
+def sniff_charset(prefix: bytes) -> Optional[str]:
+    '''
+        Guesses the encoding of an HTML document from its first bytes, using
+        a byte order mark if there is one, and otherwise a <meta charset>
+        declaration. Returns None if neither is found.
+    '''
+    for bom, charset in BYTE_ORDER_MARKS:
+        if prefix.startswith(bom):
+            return charset
+
+    match = META_CHARSET.search(prefix[:PRESCAN_LENGTH])
+    if not match: return None
+
+    try:
+        charset = codecs.lookup(match.group(1).decode("ascii")).name
+    except LookupError:
+        return None
+
+    # The document was readable as ASCII to find the declaration, so it
+    # can't really be UTF-16, whatever it says.
+    if charset.startswith("utf-16"):
+        return "utf-8"
+
+    return charset
@@ -0,0 +1,37 @@
+import time
+from typing import Dict, Optional
+
+class ResourceTiming:
+    '''
+        Timestamps of the phases of fetching a single resource, taken with
+        time.perf_counter(). A phase that didn't happen, such as DNS and
+        connect on a reused connection, has no marks.
+
+        Marks, in the order they are normally taken:
+          - dns_start, dns_end
+          - connect_start, connect_end
+          - tls_start, tls_end
+          - send_start, request_sent
+          - first_byte
+          - body_complete
+    '''
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.start = time.perf_counter()
+        self.wall_start = time.time()
+        self.marks: Dict[str, float] = {}
+        self.cache: Optional[str] = None
+        self.reused_connection = False
+
+    def mark(self, name: str) -> None:
+        self.marks[name] = time.perf_counter()
+
+    def duration(self, start: str, end: str) -> Optional[float]:
+        '''
+            Returns the time between two marks in milliseconds, or None if
+            either mark was not taken.
+        '''
+        if start not in self.marks or end not in self.marks:
+            return None
+        return (self.marks[end] - self.marks[start]) * 1000
@@ -1,15 +1,52 @@
 from __future__ import annotations
-from typing import Optional
+from typing import Dict, Iterator, Optional, Tuple
 
-import socket
-import ssl
+import mmap
+import os
 
+from url.cache import CACHE
+from url.connection_pool import POOL, Connection
+from url.decoding import SUPPORTED_CONTENT_ENCODINGS, \
+    decode_content, read_chunked, read_length, read_until_close
 from url.parser import UrlParser
+from url.response import DEFAULT_CHARSET, Response
+from url.sniffing import PRESCAN_LENGTH, sniff_charset
+from url.timing import ResourceTiming
+
+# Local files are decoded a block at a time. Blocks are larger than network
+# blocks, since reading them from the page cache is cheap.
+FILE_BLOCK_SIZE = 1024 * 1024
+
+# Methods whose requests can be sent twice with the same effect as once.
+IDEMPOTENT_METHODS = ["GET", "HEAD", "PUT", "DELETE", "OPTIONS", "TRACE"]
+
+class FileBlocks:
+    '''
+        The blocks of a file, read by memory-mapping it, so that the OS pages
+        it in as it is read, and a large file never needs to be copied into
+        memory all at once. The blocks can be iterated over more than once;
+        each time maps the file again.
+    '''
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+
+    def __iter__(self) -> Iterator[bytes]:
+        with open(self.file_path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+
+            # Empty files can't be memory-mapped.
+            if size == 0: return
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for start in range(0, size, FILE_BLOCK_SIZE):
+                    yield mapped[start:start + FILE_BLOCK_SIZE]
 
 class Url:
     '''
         Parses a URL and then attempts to request the content from it. If the
-        host has an http scheme, then a HTTP 1.0 request is made to the host.
+        host has an http scheme, then a HTTP 1.1 request is made to the host
+        over a pooled, keep-alive connection.
         If the host has a file scheme, then a read to disk is initiated.
     
         Supported schemes include:
@@ -24,32 +61,98 @@ class Url:
         self.port = url_parts["port"]
         self.scheme = url_parts["scheme"]
 
-    def request(self, payload: Optional[str] = None) -> str:
+    def request(self, payload: Optional[str] = None, timing: Optional[ResourceTiming] = None) -> str:
 
         # If the URL is to a file, then try to read the file contents.
         if self.scheme == "file":
             content = self.read_file(self.path)
             return content
 
-        # Otherwise, try to connect to the web server.
+        # Otherwise, try to connect to the web server, and decode the
+        # body using the charset from the Content-Type response header.
+        return self.open(payload, timing).text()
+
+    def open(self, payload: Optional[str] = None, timing: Optional[ResourceTiming] = None) -> Response:
+        '''
+            Requests the content and returns a streaming response, whose body
+            has not been read yet. Consumers should iterate over the response
+            (or its iter_text()) to process the body as it arrives.
+
+            If a timing is given, the phases of the request are recorded in it.
+        '''
+        timing = timing or ResourceTiming(str(self))
+
+        if self.scheme == "file":
+            return self.open_file(self.path, timing)
+
+        if payload:
+            # A POST may change the resource, so a cached copy is now stale.
+            CACHE.remove(str(self))
+            return self.fetch("POST", {}, timing, payload)
+        else:
+            return self.get(timing)
+
+    def get(self, timing: ResourceTiming) -> Response:
+        '''
+            Makes a GET request, using the HTTP cache where possible. A fresh
+            cached response is used without contacting the server. A stale
+            one is revalidated with a conditional request, and reused if the
+            server responds 304 Not Modified.
+        '''
+        key = str(self)
+        entry = CACHE.lookup(key)
+
+        if entry and entry.is_fresh():
+            CACHE.record_hit()
+            timing.cache = "hit"
+            return Response("200", entry.headers, [entry.body], timing=timing, buffered=True)
 
-        s = socket.socket(
-            family=socket.AF_INET,
-            # We can send arbitrary amounts of data with a stream.
-            type=socket.SOCK_STREAM,
-            proto=socket.IPPROTO_TCP,
-        )
+        request_headers = entry.validators() if entry else {}
+        response = self.fetch("GET", request_headers, timing)
 
-        if self.scheme == "https":
-            ctx = ssl.create_default_context()
-            s = ctx.wrap_socket(s, server_hostname=self.host)
+        if response.status == "304" and entry:
+            # Read the empty body so that the connection can be reused.
+            response.read()
+            CACHE.revalidate(key, entry, response.headers)
+            timing.cache = "revalidated"
+            return Response("200", entry.headers, [entry.body], timing=timing, buffered=True)
 
-        s.connect((self.host, self.port))
+        CACHE.record_miss()
+        timing.cache = "miss"
+        if response.status == "200" and CACHE.is_storable(response.headers):
+            return self.store_when_read(key, response)
 
-        method = "POST" if payload else "GET"
+        return response
+
+    def store_when_read(self, key: str, response: Response) -> Response:
+        '''
+            Wraps a response so that its body is added to the HTTP cache
+            once the consumer has read all of it.
+        '''
+        def blocks() -> Iterator[bytes]:
+            body = []
+            for block in response:
+                body.append(block)
+                yield block
+            CACHE.store(key, response.headers, b"".join(body))
+
+        return Response(response.status, response.headers, blocks(), timing=response.timing, stored=True)
+
+    def fetch(
+        self,
+        method: str,
+        request_headers: Dict[str, str],
+        timing: ResourceTiming,
+        payload: Optional[str] = None
+    ) -> Response:
+        '''
+            Sends a request to the web server, and reads the status line and
+            the response headers. The body is left on the connection, to be
+            decompressed as the returned response is consumed.
+        '''
 
         # It's important to use \r\n instead of \n.
-        request = "{} {} HTTP/1.0\r\n".format(method, self.path)
+        request = "{} {} HTTP/1.1\r\n".format(method, self.path)
 
         # It's important to put two newlines at the end,
         # otherwise the server will keep waiting for that
@@ -57,6 +160,16 @@ class Url:
         request += "Host: {}\r\n".format(self.host)
         request += "User-Agent: {}\r\n".format('MonarchBrowser/1.0.0')
 
+        # Ask the server to leave the connection open, so that it
+        # can be reused by the next request to the same host.
+        request += "Connection: keep-alive\r\n"
+
+        # Let the server compress the body to save bytes on the wire.
+        request += "Accept-Encoding: {}\r\n".format(", ".join(SUPPORTED_CONTENT_ENCODINGS))
+
+        for header, value in request_headers.items():
+            request += "{}: {}\r\n".format(header, value)
+
         # Content-Length header is mandatory for POST.
         if payload:
             length = len(payload.encode("utf8"))
@@ -67,40 +180,130 @@ class Url:
         if payload:
             request += payload
 
-        # Convert the text into bytes and send the request.
-        s.send(request.encode("utf8"))
+        # Convert the text into bytes.
+        request = request.encode("utf8")
+
+        # An idle pooled connection may have been closed by the server, and
+        # a request sent on it then has to be retried. That is only safe if
+        # sending it twice does no harm, so other requests, like form posts,
+        # always get a fresh connection.
+        reuse = method in IDEMPOTENT_METHODS
+        conn = POOL.acquire(self.scheme, self.host, self.port, reuse=reuse, timing=timing)
+        def send(conn: Connection) -> bytes:
+            # Sends the request and returns the status line of the response.
+            timing.mark("send_start")
+            conn.send(request)
+            timing.mark("request_sent")
+            statusline = conn.file.readline()
+            timing.mark("first_byte")
+            if not statusline:
+                raise ConnectionError("Connection closed by server")
+            return statusline
+
+        try:
+            try:
+                statusline = send(conn)
+            except (ConnectionError, OSError):
+                # A pooled connection may have been closed by the server
+                # while it was idle. Retry once on a fresh connection.
+                if not conn.reused: raise
+                POOL.release(conn, reusable=False)
+                conn = POOL.acquire(self.scheme, self.host, self.port, reuse=False, timing=timing)
+                statusline = send(conn)
+
+            version, status, explanation = \
+                statusline.decode("iso-8859-1").split(" ", 2)
+
+            response_headers = {}
+            while True:
+                line = conn.file.readline().decode("iso-8859-1")
+                if line in ["\r\n", "\n", ""]: break
+                header, value = line.split(":", 1)
+                # We use casefold() instead of lower() because it works
+                # better for more languages.
+                response_headers[header.casefold()] = value.strip()
+
+            blocks, reusable = self.read_body(conn, version, status, response_headers)
 
-        # Encode the response bytes into a UTF-8 string.
-        # Hard-coding UTF-8 is not correct. Instead, we
-        # should be looking at the charset declaration in
-        # the Content-Type response header.
-        response = s.makefile("r", encoding="utf8", newline="\r\n")
+            # Decompress the body as it arrives.
+            content_encoding = response_headers.get("content-encoding", "")
+            blocks = decode_content(blocks, content_encoding)
+        except Exception:
+            POOL.release(conn, reusable=False)
+            raise
 
-        statusline = response.readline()
-        version, status, explanation = statusline.split(" ", 2)
+        # The connection can only be reused once the whole body has been
+        # read off of it.
+        def release(complete: bool) -> None:
+            POOL.release(conn, reusable and complete)
 
-        response_headers = {}
-        while True:
-            line = response.readline()
-            if line == "\r\n": break
-            header, value = line.split(":", 1)
-            # We use casefold() instead of lower() because it works
-            # better for more languages.
-            response_headers[header.casefold()] = value.strip()
+        return Response(status, response_headers, blocks, release, timing)
 
-        assert "transfer-encoding" not in response_headers
-        assert "content-encoding" not in response_headers
+    def read_body(
+        self,
+        conn: Connection,
+        version: str,
+        status: str,
+        response_headers: Dict[str, str]
+    ) -> Tuple[Iterator[bytes], bool]:
+        '''
+            Returns an iterator over the raw body blocks and whether the
+            connection can be reused once the iterator is exhausted.
+        '''
+        keep_alive = self.keep_alive(version, response_headers)
 
-        content = response.read()
-        s.close()
+        # Transfer codings are listed in the order they were applied, so
+        # a chunked body is one whose last coding is chunked, as in
+        # "Transfer-Encoding: gzip, chunked".
+        transfer_encoding = response_headers.get("transfer-encoding", "").casefold()
+        transfer_codings = [coding.strip() for coding in transfer_encoding.split(",") if coding.strip()]
+
+        if status.startswith("1") or status in ("204", "304"):
+            # These responses never have a body, whatever their headers say
+            # (RFC 9112 section 6.3). Reading until the server closes the
+            # connection would wait forever on a keep-alive connection.
+            return iter([]), keep_alive
+        elif transfer_codings and transfer_codings[-1] == "chunked":
+            # Chunked framing takes precedence over Content-Length.
+            blocks, reusable = read_chunked(conn.file), keep_alive
+            transfer_codings.pop()
+        elif transfer_codings:
+            # Any other last coding leaves the body running until the
+            # server closes the connection.
+            blocks, reusable = read_until_close(conn.file), False
+        elif "content-length" in response_headers:
+            # The body is framed by Content-Length, so we know exactly
+            # where it ends without waiting for the server to close.
+            length = int(response_headers["content-length"])
+            return read_length(conn.file, length), keep_alive
+        else:
+            # The body runs until the server closes the connection.
+            return read_until_close(conn.file), False
 
-        return content
+        # Undo the remaining transfer codings, last applied first.
+        for coding in reversed(transfer_codings):
+            blocks = decode_content(blocks, coding)
+        return blocks, reusable
+
+    def keep_alive(self, version: str, response_headers: Dict[str, str]) -> bool:
+        connection = response_headers.get("connection", "").casefold()
+        if version == "HTTP/1.1":
+            return connection != "close"
+        else:
+            return connection == "keep-alive"
     
+    def open_file(self, file_path: str, timing: Optional[ResourceTiming] = None) -> Response:
+        # Files have no Content-Type header, so guess the charset from the
+        # start of the file instead of assuming UTF-8.
+        with open(file_path, "rb") as file:
+            charset = sniff_charset(file.read(PRESCAN_LENGTH)) or DEFAULT_CHARSET
+
+        headers = {"content-type": "text/html; charset=" + charset}
+        return Response("200", headers, FileBlocks(file_path), timing=timing, buffered=True)
+
     def read_file(self, file_path: str) -> str | None:
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-                return content
+            return self.open_file(file_path).text()
         except FileNotFoundError:
             print(f"Error: File not found at {file_path}")
             return None